@@ -0,0 +1,266 @@
+"""
+Benchmarks del bot contra un Excel falso en memoria (no hace falta Google ni Discord).
+
+    python benchmark.py
+    python benchmark.py --obras 10 50 200 --caps 100 300 --latencia 0.05
+    python benchmark.py --json resultados.json
+
+Para cada función, tamaño (obras x caps por obra) y escenario mide:
+- tiempo (el mejor de varias repeticiones)
+- llamadas a la API de Sheets/Drive, por tipo (y celdas descargadas)
+- pico de memoria (tracemalloc)
+
+Escenarios:
+- frio: sin nada en caché (primer uso tras arrancar)
+- vencido: pasó el TTL pero nadie tocó el Excel
+- caliente: caché vigente
+"""
+import argparse
+import asyncio
+import datetime
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+from collections import Counter
+
+import gspread
+from gspread.utils import a1_range_to_grid_range
+
+ENCABEZADOS = [
+    "Cap", "RAW subida", "Trad. listo", "Clean listo", "Type listo", "Subido a temple",
+    "Traductor", "Cleaner", "Typer", "Notas", "Links", "Créditos",
+]
+PERSONAS = ["ana", "bea", "caro", "dani", "eli", "fer", ""]
+DIAS = ["lunes", "martes", "miércoles", "jueves", "viernes", "sábado", "domingo"]
+
+# =========================
+# EXCEL FALSO
+# =========================
+class HojaFalsa:
+    """Lo mínimo de gspread.Worksheet que usa el bot."""
+
+    def __init__(self, excel, title, filas):
+        self.excel = excel
+        self.title = title
+        self.filas = filas
+
+    def get_all_values(self):
+        self.excel.llamada("get_all_values")
+        return [list(f) for f in self.filas]
+
+class ExcelFalso:
+    """Lo mínimo de gspread.Spreadsheet que usa el bot, contando llamadas y con latencia."""
+
+    def __init__(self, hojas, latencia=0.0):
+        self.hojas = hojas
+        self.latencia = latencia
+        self.llamadas = Counter()
+        self.revision = "1"
+
+    def llamada(self, tipo):
+        self.llamadas[tipo] += 1
+        if self.latencia:
+            time.sleep(self.latencia)
+
+    def worksheets(self, exclude_hidden=False):
+        self.llamada("worksheets")
+        return [HojaFalsa(self, t, f) for t, f in self.hojas.items()]
+
+    def worksheet(self, title):
+        self.llamada("worksheet")
+        if title not in self.hojas:
+            raise gspread.exceptions.WorksheetNotFound(title)
+        return HojaFalsa(self, title, self.hojas[title])
+
+    def get_lastUpdateTime(self):
+        self.llamada("drive_modifiedTime")
+        return self.revision
+
+    def values_batch_get(self, ranges, params=None):
+        self.llamada("values_batch_get")
+        rangos = []
+        for rango in ranges:
+            hoja, _, a1 = rango.rpartition("!") if "!" in rango else (rango, "", "")
+            valores = recortar(self.hojas[hoja[1:-1].replace("''", "'")], a1)
+            self.llamadas["celdas"] += sum(len(f) for f in valores)
+            rangos.append({"range": rango, "values": valores})
+        return {"valueRanges": rangos}
+
+def recortar(filas, a1):
+    """Como la API: solo el rango pedido, sin celdas ni filas vacías al final."""
+    grilla = a1_range_to_grid_range(a1) if a1 else {}
+    desde_fila, hasta_fila = grilla.get("startRowIndex", 0), grilla.get("endRowIndex", len(filas))
+    desde_col, hasta_col = grilla.get("startColumnIndex", 0), grilla.get("endColumnIndex")
+    valores = []
+    for fila in filas[desde_fila:hasta_fila]:
+        fila = list(fila[desde_col:hasta_col])
+        while fila and fila[-1] == "":
+            fila.pop()
+        valores.append(fila)
+    while valores and not valores[-1]:
+        valores.pop()
+    return valores
+
+def generar_excel(obras, caps, semilla=0):
+    """Hojas sintéticas: la mayoría de caps ya publicados y una cola en distintas etapas."""
+    rnd = random.Random(semilla)
+    hojas = {"CARPETAS": [["Carpeta", "Link"]], "DIA DE SUBIDA": [["Obra", "Día"]]}
+    for n in range(obras):
+        filas = [[f"Obra {n}"], list(ENCABEZADOS)]
+        publicados = rnd.randint(caps * 2 // 3, caps)
+        for cap in range(1, caps + 1):
+            if cap <= publicados:
+                filas.append([str(cap)] + ["✅"] * 5 + [rnd.choice(PERSONAS[:-1])] * 3 + ["", "https://x", "equipo"])
+                continue
+            avance = rnd.randint(0, 5)
+            etapas = ["✅" if i < avance else "" for i in range(5)]
+            personas = [rnd.choice(PERSONAS) for _ in range(3)]
+            filas.append([str(cap)] + etapas + personas + ["nota", "", ""])
+        hojas[f"obra-{n}"] = filas
+    return hojas
+
+def generar_calendario(obras, semilla=0):
+    rnd = random.Random(semilla)
+    cal = {}
+    for n in range(obras):
+        if rnd.random() < 0.7:
+            cal[f"obra-{n}"] = {"tipo": "semana", "valor": rnd.choice(DIAS)}
+        elif rnd.random() < 0.5:
+            cal[f"obra-{n}"] = {"tipo": "semana_multiple", "valor": rnd.sample(DIAS, 2)}
+        else:
+            cal[f"obra-{n}"] = {"tipo": "mes", "valor": sorted(rnd.sample(range(1, 29), 3))}
+    return cal
+
+# =========================
+# BOT CONTRA EL EXCEL FALSO
+# =========================
+def importar_bot(excel):
+    """Importa bot.py apuntando al Excel falso, con el estado en una carpeta temporal."""
+    # El Excel falso no tiene cuota: que la cubeta de llamadas no frene las mediciones
+    os.environ.setdefault("SHEETS_CUOTA_MINUTO", "1000000000")
+    os.environ.setdefault("SHEETS_RAFAGA", "1000000000")
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    os.chdir(tempfile.mkdtemp(prefix="bench-bot-"))
+    import bot  # no se conecta a nada al importar
+    bot._conexion["excel"] = excel
+    return bot
+
+class CtxFalso:
+    def __init__(self):
+        self.enviados = []
+
+    async def send(self, msg):
+        self.enviados.append(msg)
+
+def vaciar_cache(bot):
+    bot._snapshot.update(hojas={}, cargado=0.0, titulos=[], titulos_cargado=0.0,
+                         revision=None, huellas={}, cambiadas=set())
+    bot._encabezados.clear()
+
+def vencer_cache(bot):
+    bot._snapshot["cargado"] = 1.0
+
+ESCENARIOS = {
+    "frio": vaciar_cache,
+    "vencido": vencer_cache,
+    "caliente": lambda bot: None,
+}
+
+def funciones(bot):
+    hoy = bot.ahora_local()
+
+    async def detectar_raw():
+        bot.detectar_raw(await bot.obtener_snapshot_async())
+
+    async def caps_a_asignar():
+        bot.obtener_caps_a_asignar_para_fecha(hoy.date(), await bot.obtener_snapshot_async())
+
+    async def hoy_cmd():
+        await bot.hoy.callback(CtxFalso())
+
+    async def chequeo():
+        bot._estado[bot.ARCHIVO_EJECUCIONES] = {}  # que el turno no figure como ya enviado
+        await bot.ejecutar_recordatorio(bot.ultimo_turno(hoy))
+
+    return {
+        "detectar_raw": detectar_raw,
+        "obtener_caps_a_asignar_para_fecha": caps_a_asignar,
+        "hoy": hoy_cmd,
+        "chequeo_automatico": chequeo,
+    }
+
+async def medir(bot, excel, func, preparar, repeticiones):
+    # Precalienta para que "vencido" y "caliente" partan de un snapshot cargado
+    vaciar_cache(bot)
+    await func()
+
+    tiempos = []
+    for _ in range(repeticiones):
+        preparar(bot)
+        excel.llamadas.clear()
+        t0 = time.perf_counter()
+        await func()
+        tiempos.append(time.perf_counter() - t0)
+    llamadas = dict(excel.llamadas)
+
+    preparar(bot)
+    tracemalloc.start()
+    await func()
+    _, pico = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {"segundos": min(tiempos), "llamadas": llamadas, "pico_bytes": pico}
+
+async def correr(args):
+    excel = ExcelFalso({}, latencia=args.latencia)
+    bot = importar_bot(excel)
+    enviados = []
+
+    async def dm_falso(*mensajes):
+        enviados.extend(mensajes)
+
+    bot.enviar_dm = dm_falso
+
+    resultados = []
+    for obras in args.obras:
+        for caps in args.caps:
+            excel.hojas = generar_excel(obras, caps)
+            bot.guardar(bot.ARCHIVO_CALENDARIO, generar_calendario(obras))
+            for nombre, func in funciones(bot).items():
+                for escenario, preparar in ESCENARIOS.items():
+                    r = await medir(bot, excel, func, preparar, args.repeticiones)
+                    r.update(funcion=nombre, obras=obras, caps=caps, escenario=escenario)
+                    resultados.append(r)
+                    imprimir(r)
+    return resultados
+
+def imprimir(r):
+    llamadas = ", ".join(f"{k}={v}" for k, v in sorted(r["llamadas"].items())) or "-"
+    print(
+        f"{r['funcion']:<34} {r['obras']:>4} obras {r['caps']:>4} caps  {r['escenario']:<8}"
+        f" {r['segundos'] * 1000:>9.2f} ms  {r['pico_bytes'] / 1024:>9.1f} KiB  API: {llamadas}"
+    )
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--obras", type=int, nargs="+", default=[10, 50, 200])
+    parser.add_argument("--caps", type=int, nargs="+", default=[100, 300])
+    parser.add_argument("--latencia", type=float, default=0.0, help="segundos por llamada a la API")
+    parser.add_argument("--repeticiones", type=int, default=3)
+    parser.add_argument("--json", help="guardar los resultados en este archivo")
+    args = parser.parse_args()
+    if args.json:
+        args.json = os.path.abspath(args.json)  # importar_bot cambia de carpeta
+
+    print(f"Benchmark {datetime.datetime.now():%Y-%m-%d %H:%M} latencia={args.latencia}s")
+    resultados = asyncio.run(correr(args))
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(resultados, f, indent=2, ensure_ascii=False)
+
+if __name__ == "__main__":
+    main()
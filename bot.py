@@ -1,827 +1,3295 @@
-import discord
-from discord.ext import commands, tasks
-import gspread
-import json
-import datetime
-import os
-from flask import Flask
-from threading import Thread
-
-# =========================
-# CONFIGURACIÓN DESDE RENDER
-# =========================
-DISCORD_TOKEN = os.environ.get("DISCORD_TOKEN")
-GOOGLE_SHEETS_URL = os.environ.get("GOOGLE_SHEETS_URL")
-GOOGLE_CREDENTIALS = os.environ.get("GOOGLE_CREDENTIALS")
-OWNER_ID = int(os.environ.get("OWNER_ID"))  # Tu ID de Discord
-
-cred_dict = json.loads(GOOGLE_CREDENTIALS)
-gc = gspread.service_account_from_dict(cred_dict)
-sh = gc.open_by_url(GOOGLE_SHEETS_URL)
-
-intents = discord.Intents.default()
-intents.message_content = True
-bot = commands.Bot(command_prefix="!", intents=intents)
-
-# Hojas a ignorar
-IGNORAR_HOJAS = {"CARPETAS", "DIA DE SUBIDA"}
-
-# Archivos de datos
-ARCHIVO_HIATUS = "hiatus.json"
-ARCHIVO_SOLO = "solo.json"
-ARCHIVO_CALENDARIO = "calendario.json"
-ARCHIVO_PLAZOS = "plazos.json"
-ARCHIVO_ALIAS = "alias.json"
-
-# Map de días en inglés -> español
-TRAD = {
-    "monday": "lunes",
-    "tuesday": "martes",
-    "wednesday": "miércoles",
-    "thursday": "jueves",
-    "friday": "viernes",
-    "saturday": "sábado",
-    "sunday": "domingo",
-}
-DIAS_VALIDOS = list(TRAD.values())
-
-# =========================
-# SERVIDOR WEB 24/7 (ANTI-SLEEP)
-# =========================
-app = Flask("")
-
-@app.route("/")
-def home():
-    return "Bot activo 24/7"
-
-def run_web():
-    app.run(host="0.0.0.0", port=10000)
-
-def mantener_vivo():
-    t = Thread(target=run_web)
-    t.daemon = True
-    t.start()
-
-# =========================
-# UTILIDADES DE ARCHIVOS
-# =========================
-def cargar(archivo, defecto):
-    if not os.path.exists(archivo):
-        return defecto
-    with open(archivo, "r", encoding="utf-8") as f:
-        return json.load(f)
-
-def guardar(archivo, data):
-    with open(archivo, "w", encoding="utf-8") as f:
-        json.dump(data, f, indent=2, ensure_ascii=False)
-
-# =========================
-# UTILIDADES DE RESPUESTA
-# =========================
-async def responder(ctx, msg: str):
-    await ctx.send(msg)
-
-async def enviar_dm(msg: str):
-    user = await bot.fetch_user(OWNER_ID)
-    await user.send(msg)
-
-# =========================
-# ALIAS DE OBRAS
-# =========================
-def resolver_obra(nombre_entrada: str) -> str:
-    alias = cargar(ARCHIVO_ALIAS, {})
-    return alias.get(nombre_entrada, nombre_entrada)
-
-@bot.command()
-async def alias(ctx, corto, *, completo):
-    data = cargar(ARCHIVO_ALIAS, {})
-    data[corto] = completo
-    guardar(ARCHIVO_ALIAS, data)
-    await responder(ctx, f"✅ Alias agregado:\n{corto} → {completo}")
-
-@bot.command()
-async def ver_alias(ctx):
-    data = cargar(ARCHIVO_ALIAS, {})
-    if not data:
-        await responder(ctx, "📂 No hay alias registrados.")
-        return
-    msg = "📂 ALIAS:\n"
-    for corto, largo in data.items():
-        msg += f"- {corto} → {largo}\n"
-    await responder(ctx, msg)
-
-# =========================
-# UTILIDADES DE HOJAS / CAPS
-# =========================
-def obtener_hoja_y_datos(obra: str):
-    """Devuelve (hoja, headers, datos) o (None, None, None) si falla."""
-    try:
-        hoja = sh.worksheet(obra)
-    except Exception:
-        return None, None, None
-
-    datos = hoja.get_all_values()
-    if len(datos) < 3:
-        return hoja, None, None
-
-    headers = [h.lower().strip() for h in datos[1]]
-    return hoja, headers, datos
-
-def encontrar_proximo_cap_no_temple(headers, datos):
-    """Primer cap donde 'subido a temple' != ✅."""
-    if "subido a temple" not in headers:
-        return None, None
-    idx_temple = headers.index("subido a temple")
-
-    for fila in datos[2:]:
-        if len(fila) <= idx_temple:
-            continue
-        cap = fila[0]
-        if not cap:
-            continue
-        val_temple = fila[idx_temple]
-        if val_temple != "✅":
-            return cap, fila
-    return None, None
-
-def faltas_asignacion(headers, fila):
-    """
-    Mira columnas 'traductor', 'cleaner', 'typer' para ver qué falta asignar.
-    Devuelve lista como ['Tradu', 'Clean', 'Type'].
-    """
-    faltan = []
-
-    def vacio(v):
-        return (v is None) or (v.strip() == "")
-
-    # Traductor
-    if "traductor" in headers:
-        idx = headers.index("traductor")
-        if len(fila) <= idx or vacio(fila[idx]):
-            faltan.append("Tradu")
-
-    # Cleaner
-    if "cleaner" in headers:
-        idx = headers.index("cleaner")
-        if len(fila) <= idx or vacio(fila[idx]):
-            faltan.append("Clean")
-
-    # Typer
-    if "typer" in headers:
-        idx = headers.index("typer")
-        if len(fila) <= idx or vacio(fila[idx]):
-            faltan.append("Type")
-
-    return faltan
-
-def cap_listo_para_temple(headers, fila):
-    """
-    Devuelve True si RAW, trad, clean y type están listos (✅) pero no subido a temple.
-    """
-    necesarios = ["raw subida", "trad. listo", "clean listo", "type listo", "subido a temple"]
-    if not all(n in headers for n in necesarios):
-        return False
-
-    idx_raw = headers.index("raw subida")
-    idx_trad = headers.index("trad. listo")
-    idx_clean = headers.index("clean listo")
-    idx_type = headers.index("type listo")
-    idx_temple = headers.index("subido a temple")
-
-    if len(fila) <= max(idx_raw, idx_trad, idx_clean, idx_type, idx_temple):
-        return False
-
-    val_raw = fila[idx_raw]
-    val_trad = fila[idx_trad]
-    val_clean = fila[idx_clean]
-    val_type = fila[idx_type]
-    val_temple = fila[idx_temple]
-
-    return (val_raw == "✅" and
-            val_trad == "✅" and
-            val_clean == "✅" and
-            val_type == "✅" and
-            val_temple != "✅")
-
-# =========================
-# DETECTAR RAW (SIGUIENTE CAPÍTULO)
-# =========================
-def detectar_raw():
-    avisos = []
-    hiatus = cargar(ARCHIVO_HIATUS, [])
-    solo = cargar(ARCHIVO_SOLO, [])
-
-    for hoja in sh.worksheets():
-        nombre = hoja.title
-        if nombre in IGNORAR_HOJAS or nombre in hiatus or nombre in solo:
-            continue
-
-        datos = hoja.get_all_values()
-        if len(datos) < 3:
-            continue
-
-        encabezados = [c.lower().strip() for c in datos[1]]
-        if "raw subida" not in encabezados or "subido a temple" not in encabezados:
-            continue
-
-        idx_raw = encabezados.index("raw subida")
-        idx_temple = encabezados.index("subido a temple")
-
-        for fila in datos[2:]:
-            if len(fila) <= max(idx_raw, idx_temple):
-                continue
-            cap = fila[0]
-            if not cap:
-                continue
-            val_raw = fila[idx_raw]
-            val_temple = fila[idx_temple]
-            if val_temple != "✅":
-                if val_raw != "✅":
-                    avisos.append((nombre, cap))
-                break
-
-    return avisos
-
-# =========================
-# READY
-# =========================
-@bot.event
-async def on_ready():
-    print("✅ Bot activo 24/7 (horario Perú)")
-    if not chequeo_automatico.is_running():
-        chequeo_automatico.start()
-
-# =========================
-# COMANDOS BÁSICOS
-# =========================
-@bot.command()
-async def ping(ctx):
-    await responder(ctx, "pong 🏓")
-
-@bot.command()
-async def raw_pendientes(ctx):
-    raws = detectar_raw()
-    if not raws:
-        await responder(ctx, "⭑ RAW PENDIENTES ⭑\n\n✅ No hay RAW pendientes para el siguiente Cap de cada obra.")
-    else:
-        lineas = [f"• {obra} → Cap {cap}" for obra, cap in raws]
-        msg = "⭑ RAW PENDIENTES ⭑\n\n" + "\n".join(lineas)
-        await responder(ctx, msg)
-
-# =========================
-# VER ESTADO
-# =========================
-@bot.command()
-async def ver_estado(ctx, obra, cap):
-    obra = resolver_obra(obra)
-    hoja, headers, datos = obtener_hoja_y_datos(obra)
-    if hoja is None or headers is None:
-        await responder(ctx, "❌ No pude leer esa obra en el Excel.")
-        return
-
-    try:
-        col_raw = headers.index("raw subida")
-        col_trad = headers.index("trad. listo")
-        col_clean = headers.index("clean listo")
-        col_type = headers.index("type listo")
-        col_temple = headers.index("subido a temple")
-    except ValueError:
-        await responder(ctx, "❌ Faltan columnas esperadas en esa hoja (RAW / listo / Temple).")
-        return
-
-    fila = next((f for f in datos[2:] if len(f) > 0 and f[0] == cap), None)
-    if not fila:
-        await responder(ctx, "❌ Capítulo no encontrado.")
-        return
-
-    def estado(v):
-        return "✅ listo" if v == "✅" else "⏳ pendiente"
-
-    msg = f"⭑ ESTADO {obra} Cap {cap} ⭑\n\n"
-    msg += f"{estado(fila[col_raw])} RAW\n"
-    msg += f"{estado(fila[col_trad])} Traducción\n"
-    msg += f"{estado(fila[col_clean])} Clean\n"
-    msg += f"{estado(fila[col_type])} Type\n"
-    msg += f"{estado(fila[col_temple])} Subido a Temple\n"
-
-    await responder(ctx, msg)
-
-# =========================
-# HIATUS
-# =========================
-@bot.command()
-async def hiatus(ctx, *, obra):
-    obra = resolver_obra(obra)
-    data = cargar(ARCHIVO_HIATUS, [])
-    if obra not in data:
-        data.append(obra)
-        guardar(ARCHIVO_HIATUS, data)
-        await responder(ctx, f"🔕 {obra} en hiatus")
-    else:
-        await responder(ctx, f"ℹ️ {obra} ya estaba en hiatus")
-
-@bot.command()
-async def reactivar(ctx, *, obra):
-    obra = resolver_obra(obra)
-    data = cargar(ARCHIVO_HIATUS, [])
-    if obra in data:
-        data.remove(obra)
-        guardar(ARCHIVO_HIATUS, data)
-        await responder(ctx, f"🔔 {obra} reactivada")
-    else:
-        await responder(ctx, f"ℹ️ {obra} no estaba en hiatus")
-
-@bot.command()
-async def ver_hiatus(ctx):
-    data = cargar(ARCHIVO_HIATUS, [])
-    if not data:
-        await responder(ctx, "✅ No hay obras en hiatus.")
-    else:
-        msg = "🔕 OBRAS EN HIATUS:\n" + "\n".join(f"- {o}" for o in data)
-        await responder(ctx, msg)
-
-# =========================
-# SOLO
-# =========================
-@bot.command()
-async def solo(ctx, *, obra):
-    obra = resolver_obra(obra)
-    data = cargar(ARCHIVO_SOLO, [])
-    if obra not in data:
-        data.append(obra)
-        guardar(ARCHIVO_SOLO, data)
-        await responder(ctx, f"🧍 {obra} en modo SOLO")
-    else:
-        await responder(ctx, f"ℹ️ {obra} ya estaba en modo SOLO")
-
-@bot.command()
-async def reactivar_solo(ctx, *, obra):
-    obra = resolver_obra(obra)
-    data = cargar(ARCHIVO_SOLO, [])
-    if obra in data:
-        data.remove(obra)
-        guardar(ARCHIVO_SOLO, data)
-        await responder(ctx, f"🔔 {obra} salió de SOLO")
-    else:
-        await responder(ctx, f"ℹ️ {obra} no estaba en SOLO")
-
-@bot.command()
-async def ver_solo(ctx):
-    data = cargar(ARCHIVO_SOLO, [])
-    if not data:
-        await responder(ctx, "✅ No hay obras en modo SOLO.")
-    else:
-        msg = "🧍 OBRAS SOLO:\n" + "\n".join(f"- {o}" for o in data)
-        await responder(ctx, msg)
-
-# =========================
-# CALENDARIO (DÍAS DE SUBIDA)
-# =========================
-def formatear_calendario_item(datos):
-    tipo = datos.get("tipo")
-    valor = datos.get("valor")
-
-    if tipo == "semana":
-        return str(valor)
-    if tipo == "semana_multiple":
-        return ", ".join(valor)
-    if tipo == "mes":
-        return ", ".join(str(x) for x in valor)
-    return str(datos)
-
-@bot.command()
-async def agregar_obra(ctx, obra, *, valor):
-    """
-    !agregar_obra yang-ilwoo-y-yo miércoles
-    !agregar_obra director lunes, jueves
-    !agregar_obra director 4,14,24
-    """
-    obra = resolver_obra(obra)
-    cal = cargar(ARCHIVO_CALENDARIO, {})
-    valor = valor.lower().replace(" ", "")
-
-    # Días del mes
-    if all(ch.isdigit() or ch == "," for ch in valor):
-        dias = [int(x) for x in valor.split(",") if x]
-        cal[obra] = {"tipo": "mes", "valor": dias}
-        guardar(ARCHIVO_CALENDARIO, cal)
-        bonito = formatear_calendario_item(cal[obra])
-        await responder(ctx, f"📆 {obra} → {bonito}")
-        return
-
-    # Varios días de semana
-    if "," in valor:
-        dias = valor.split(",")
-        for d in dias:
-            if d not in DIAS_VALIDOS:
-                await responder(ctx, "❌ Día inválido. Usa: lunes, martes, miércoles...")
-                return
-        cal[obra] = {"tipo": "semana_multiple", "valor": dias}
-        guardar(ARCHIVO_CALENDARIO, cal)
-        bonito = formatear_calendario_item(cal[obra])
-        await responder(ctx, f"📅 {obra} → {bonito}")
-        return
-
-    # Un solo día
-    if valor in DIAS_VALIDOS:
-        cal[obra] = {"tipo": "semana", "valor": valor}
-        guardar(ARCHIVO_CALENDARIO, cal)
-        bonito = formatear_calendario_item(cal[obra])
-        await responder(ctx, f"📅 {obra} → {bonito}")
-        return
-
-    await responder(ctx, "❌ Formato inválido. Ejemplo: lunes / lunes,viernes / 4,14,24")
-
-@bot.command()
-async def cambiar_dia(ctx, obra, *, nuevo_valor):
-    obra = resolver_obra(obra)
-    cal = cargar(ARCHIVO_CALENDARIO, {})
-    if obra not in cal:
-        await responder(ctx, "❌ Esa obra no está en el calendario.")
-        return
-    ctx.message.content = f"!agregar_obra {obra} {nuevo_valor}"
-    await agregar_obra(ctx, obra, valor=nuevo_valor)
-
-@bot.command()
-async def eliminar_obra(ctx, *, obra):
-    obra_real = resolver_obra(obra)
-    cal = cargar(ARCHIVO_CALENDARIO, {})
-    if obra_real in cal:
-        del cal[obra_real]
-        guardar(ARCHIVO_CALENDARIO, cal)
-        await responder(ctx, f"🗑️ {obra_real} eliminada del calendario")
-    else:
-        await responder(ctx, "❌ Esa obra no está en el calendario.")
-
-@bot.command()
-async def calendario(ctx):
-    cal = cargar(ARCHIVO_CALENDARIO, {})
-    if not cal:
-        await responder(ctx, "📅 El calendario está vacío.")
-        return
-    msg = "📅 CALENDARIO:\n"
-    for obra, datos in cal.items():
-        bonito = formatear_calendario_item(datos)
-        msg += f"- {obra} → {bonito}\n"
-    await responder(ctx, msg)
-
-# =========================
-# HOY / MAÑANA
-# =========================
-def obras_por_fecha(fecha: datetime.date):
-    cal = cargar(ARCHIVO_CALENDARIO, {})
-    dia_semana_en = fecha.strftime("%A").lower()
-    dia_semana = TRAD.get(dia_semana_en, "")
-    dia_mes = fecha.day
-
-    resultado = []
-    for obra, datos in cal.items():
-        tipo = datos.get("tipo")
-        valor = datos.get("valor")
-
-        if tipo == "semana" and valor == dia_semana:
-            resultado.append(obra)
-        elif tipo == "semana_multiple" and dia_semana in valor:
-            resultado.append(obra)
-        elif tipo == "mes" and dia_mes in valor:
-            resultado.append(obra)
-
-    return resultado
-
-def obtener_caps_a_asignar_para_fecha(fecha_base: datetime.date):
-    """
-    Busca obras que se subirán 7 días después de 'fecha_base'
-    y devuelve lista de (obra, cap, faltas_asignar).
-    """
-    fecha_target = fecha_base + datetime.timedelta(days=7)
-    obras_target = obras_por_fecha(fecha_target)
-    hiatus = cargar(ARCHIVO_HIATUS, [])
-    solo = cargar(ARCHIVO_SOLO, [])
-    resultado = []
-
-    for obra in obras_target:
-        if obra in IGNORAR_HOJAS or obra in hiatus or obra in solo:
-            continue
-        hoja, headers, datos = obtener_hoja_y_datos(obra)
-        if hoja is None or headers is None:
-            continue
-        cap, fila = encontrar_proximo_cap_no_temple(headers, datos)
-        if not cap or not fila:
-            continue
-        faltan = faltas_asignacion(headers, fila)
-        if faltan:
-            resultado.append((obra, cap, faltan))
-
-    return resultado
-
-@bot.command()
-async def hoy(ctx):
-    # Fecha base (hoy Perú)
-    ahora = datetime.datetime.utcnow() - datetime.timedelta(hours=5)
-    fecha = ahora.date()
-
-    # Obras que se suben hoy
-    obras = obras_por_fecha(fecha)
-
-    # Caps a asignar hoy (para dentro de 7 días)
-    asignar = obtener_caps_a_asignar_para_fecha(fecha)
-
-    msg_partes = []
-
-    msg = "⭑ HOY ⭑\n\n"
-    if not obras:
-        msg += "📭 Hoy no hay obras en el calendario.\n"
-    else:
-        msg += "⬆️ Subidas a la web:\n"
-        for obra in obras:
-            # Intentamos obtener el próximo cap no subido
-            hoja, headers, datos = obtener_hoja_y_datos(obra)
-            if hoja is None or headers is None:
-                msg += f"• {obra}\n"
-                continue
-            cap, fila = encontrar_proximo_cap_no_temple(headers, datos)
-            if cap:
-                msg += f"• {obra} → Cap {cap}\n"
-            else:
-                msg += f"• {obra}\n"
-    msg_partes.append(msg)
-
-    if asignar:
-        lineas = []
-        for obra, cap, faltan in asignar:
-            faltas_txt = ", ".join(faltan)
-            lineas.append(f"• {obra} → Cap {cap} | {faltas_txt}")
-        msg2 = "\n📝 Caps por asignar (para dentro de 7 días):\n" + "\n".join(lineas)
-        msg_partes.append(msg2)
-
-    await responder(ctx, "\n".join(msg_partes))
-
-@bot.command()
-async def mañana(ctx):
-    ahora = datetime.datetime.utcnow() - datetime.timedelta(hours=5)
-    fecha = (ahora + datetime.timedelta(days=1)).date()
-
-    obras = obras_por_fecha(fecha)
-    asignar = obtener_caps_a_asignar_para_fecha(fecha)
-
-    msg_partes = []
-
-    msg = "⭑ MAÑANA ⭑\n\n"
-    if not obras:
-        msg += "📭 Mañana no hay obras en el calendario.\n"
-    else:
-        msg += "⬆️ Subidas a la web:\n"
-        for obra in obras:
-            hoja, headers, datos = obtener_hoja_y_datos(obra)
-            if hoja is None or headers is None:
-                msg += f"• {obra}\n"
-                continue
-            cap, fila = encontrar_proximo_cap_no_temple(headers, datos)
-            if cap:
-                msg += f"• {obra} → Cap {cap}\n"
-            else:
-                msg += f"• {obra}\n"
-    msg_partes.append(msg)
-
-    if asignar:
-        lineas = []
-        for obra, cap, faltan in asignar:
-            faltas_txt = ", ".join(faltan)
-            lineas.append(f"• {obra} → Cap {cap} | {faltas_txt}")
-        msg2 = "\n📝 Caps por asignar (para dentro de 7 días):\n" + "\n".join(lineas)
-        msg_partes.append(msg2)
-
-    await responder(ctx, "\n".join(msg_partes))
-
-# =========================
-# PLAZOS Y ATRASOS
-# =========================
-@bot.command()
-async def asignar_plazo(ctx, obra, cap, persona, fecha):
-    obra = resolver_obra(obra)
-    data = cargar(ARCHIVO_PLAZOS, {})
-    data.setdefault(obra, {})
-    data[obra][cap] = {"persona": persona, "fecha": fecha}
-    guardar(ARCHIVO_PLAZOS, data)
-    await responder(ctx, f"✅ Plazo asignado: {obra} Cap {cap} → {persona} hasta {fecha}")
-
-@bot.command()
-async def eliminar_plazo(ctx, obra, cap):
-    obra = resolver_obra(obra)
-    data = cargar(ARCHIVO_PLAZOS, {})
-    if obra in data and cap in data[obra]:
-        del data[obra][cap]
-        guardar(ARCHIVO_PLAZOS, data)
-        await responder(ctx, "🗑️ Plazo eliminado.")
-    else:
-        await responder(ctx, "❌ No encontré ese plazo.")
-
-@bot.command()
-async def ver_atrasos(ctx):
-    data = cargar(ARCHIVO_PLAZOS, {})
-    if not data:
-        await responder(ctx, "✅ No hay plazos registrados.")
-        return
-
-    hoy_peru = (datetime.datetime.utcnow() - datetime.timedelta(hours=5)).date()
-    atrasos = []
-
-    for obra, caps in data.items():
-        for cap, info in caps.items():
-            try:
-                f = datetime.datetime.strptime(info["fecha"], "%Y-%m-%d").date()
-            except ValueError:
-                continue
-            if hoy_peru > f:
-                dias = (hoy_peru - f).days
-                atrasos.append(f"{obra} Cap {cap} → {info['persona']} ({dias} días tarde)")
-
-    if not atrasos:
-        await responder(ctx, "✅ No hay atrasos.")
-    else:
-        msg = "⏰ ATRASOS:\n" + "\n".join(f"- {a}" for a in atrasos)
-        await responder(ctx, msg)
-
-# =========================
-# COMANDOS (LISTA)
-# =========================
-@bot.command()
-async def comandos(ctx):
-    await responder(ctx, """
-📌 COMANDOS DEL BOT
-
-!ping → Ver si el bot está activo.
-
-!raw_pendientes → Ver el siguiente Cap que falta RAW de cada obra.
-
-!ver_estado obra Cap → Ver qué falta en ese Cap (RAW, tradu, clean, type, Temple).
-
-!hiatus obra → Poner una obra en pausa (no entra en recordatorios de RAW / asignación).
-
-!reactivar obra → Quitar la obra del hiatus.
-
-!ver_hiatus → Ver todas las obras pausadas.
-
-!solo obra → Marcar una obra como solo tuya (sin recordatorios de RAW / asignación).
-
-!reactivar_solo obra → Quitar el modo solo.
-
-!ver_solo → Ver obras en modo solo.
-
-!agregar_obra obra día → Asignar día(s) de subida (semana o días del mes).
-
-!cambiar_dia obra día → Cambiar el día de subida de una obra.
-
-!eliminar_obra obra → Eliminar una obra del calendario.
-
-!calendario → Ver el calendario completo.
-
-!hoy → Ver lo que toca hoy (subidas) y qué Caps hay que asignar (para dentro de 7 días).
-
-!mañana → Ver lo que toca mañana (subidas) y qué Caps hay que asignar (para dentro de 7 días).
-
-!asignar_plazo obra Cap persona fecha → Asignar una fecha límite (YYYY-MM-DD) a alguien.
-
-!eliminar_plazo obra Cap → Borrar un plazo.
-
-!ver_atrasos → Ver quién está atrasado según los plazos.
-
-!alias corto nombre_obra → Crear una abreviación para una obra.
-
-!ver_alias → Ver todos los alias registrados.
-
-!comandos → Ver esta lista completa.
-""")
-
-# =========================
-# RECORDATORIOS AUTOMÁTICOS
-# =========================
-@tasks.loop(minutes=1)
-async def chequeo_automatico():
-    # Hora de Perú
-    ahora_peru = datetime.datetime.utcnow() - datetime.timedelta(hours=5)
-    hoy = ahora_peru.date()
-
-    # Solo actuamos a las 6:00 y 18:00
-    if ahora_peru.minute != 0 or ahora_peru.hour not in [6, 18]:
-        return
-
-    mensajes = []
-
-    # 1) RAW inmediato (siguiente Cap de cada obra)
-    raws = detectar_raw()
-    if raws:
-        lineas = [f"• {obra} → Cap {cap}" for obra, cap in raws]
-        msg_raw = "⭑ RAW PENDIENTES ⭑\n\n" + "\n".join(lineas)
-        mensajes.append(msg_raw)
-    else:
-        mensajes.append("⭑ RAW PENDIENTES ⭑\n\n✅ No hay RAW pendientes para el siguiente Cap de cada obra.")
-
-    # 2) RAW 10 días antes según calendario
-    fecha_raw_10 = hoy + datetime.timedelta(days=10)
-    obras_en_10 = obras_por_fecha(fecha_raw_10)
-    hiatus = cargar(ARCHIVO_HIATUS, [])
-    solo = cargar(ARCHIVO_SOLO, [])
-    avisos_raw_10 = []
-
-    for obra in obras_en_10:
-        if obra in IGNORAR_HOJAS or obra in hiatus or obra in solo:
-            continue
-        hoja, headers, datos = obtener_hoja_y_datos(obra)
-        if hoja is None or headers is None:
-            continue
-        if "raw subida" not in headers or "subido a temple" not in headers:
-            continue
-        idx_raw = headers.index("raw subida")
-        idx_temple = headers.index("subido a temple")
-
-        for fila in datos[2:]:
-            if len(fila) <= max(idx_raw, idx_temple):
-                continue
-            cap = fila[0]
-            if not cap:
-                continue
-            val_raw = fila[idx_raw]
-            val_temple = fila[idx_temple]
-            if val_temple != "✅":
-                if val_raw != "✅":
-                    avisos_raw_10.append((obra, cap))
-                break
-
-    if avisos_raw_10:
-        lineas = [f"• {obra} → Cap {cap}" for obra, cap in avisos_raw_10]
-        msg10 = "⭑ RAW PRÓXIMO (dentro de 10 días) ⭑\n\n" + "\n".join(lineas)
-        mensajes.append(msg10)
-
-    # 3) Caps por asignar (para dentro de 7 días desde hoy)
-    asignar_hoy = obtener_caps_a_asignar_para_fecha(hoy)
-    if asignar_hoy:
-        lineas = []
-        for obra, cap, faltan in asignar_hoy:
-            faltas_txt = ", ".join(faltan)
-            lineas.append(f"• {obra} → Cap {cap} | {faltas_txt}")
-        msg_asig = "⭑ CAPS POR ASIGNAR (para dentro de 7 días) ⭑\n\n" + "\n".join(lineas)
-        mensajes.append(msg_asig)
-
-    # 4) Al menos un Cap listo para subir a Temple
-    candidato_temple = None
-    for hoja in sh.worksheets():
-        nombre = hoja.title
-        if nombre in IGNORAR_HOJAS:
-            continue
-        hoja2, headers, datos = obtener_hoja_y_datos(nombre)
-        if hoja2 is None or headers is None:
-            continue
-        for fila in datos[2:]:
-            if cap_listo_para_temple(headers, fila):
-                cap = fila[0]
-                if cap:
-                    candidato_temple = (nombre, cap)
-                    break
-        if candidato_temple:
-            break
-
-    if candidato_temple:
-        obra_t, cap_t = candidato_temple
-        msg_temple = "⭑ LISTO PARA SUBIR A LA WEB ⭑\n\n"
-        msg_temple += f"• {obra_t} → Cap {cap_t}"
-        mensajes.append(msg_temple)
-
-    # 5) Resumen semanal simple (domingo 18:00)
-    if ahora_peru.weekday() == 6 and ahora_peru.hour == 18:
-        msg_resumen = "⭑ RESUMEN SEMANAL ⭑\n\n"
-        msg_resumen += f"RAW pendientes actuales: {len(raws)}"
-        mensajes.append(msg_resumen)
-
-    # Enviar todo por DM en bloques separados
-    for m in mensajes:
-        await enviar_dm(m)
-
-import time
-
-# =========================
-# INICIO
-# =========================
-mantener_vivo()
-
-backoff = 60  # empieza esperando 60s si Discord bloquea (evita loop de reinicios)
-
-while True:
-    try:
-        bot.run(DISCORD_TOKEN)
-        break  # si por alguna razón bot.run termina "limpio", salimos
-    except discord.HTTPException as e:
-        # Si Discord/Cloudflare bloquea (429), NO cierres el proceso: espera y reintenta
-        if getattr(e, "status", None) == 429:
-            print(f"⚠️ Rate limit / bloqueo (429). Reintentando más tarde. backoff={backoff}s")
-            time.sleep(backoff)
-            backoff = min(backoff * 2, 3600)  # máximo 1 hora
-            continue
-        raise  # otros errores: que sí falle para que lo veas
-    except Exception as e:
-        # Cualquier otro error inesperado: log y reintenta con un backoff suave
-        print(f"❌ Error inesperado: {e}. Reintentando en {backoff}s")
-        time.sleep(backoff)
-        backoff = min(backoff * 2, 3600)
-
-
+import discord
+from discord.ext import commands, tasks
+import gspread
+import asyncio
+import atexit
+import bisect
+import contextlib
+import functools
+import hashlib
+import heapq
+import hmac
+import json
+import datetime
+import math
+import os
+import random
+import sqlite3
+import threading
+import time
+import traceback
+import unicodedata
+import zlib
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+from flask import Flask, Response, jsonify, request
+from threading import Thread
+from gspread.utils import a1_range_to_grid_range, absolute_range_name, fill_gaps, rowcol_to_a1
+
+# =========================
+# CONFIGURACIÓN DESDE RENDER
+# =========================
+DISCORD_TOKEN = os.environ.get("DISCORD_TOKEN")
+GOOGLE_SHEETS_URL = os.environ.get("GOOGLE_SHEETS_URL")
+GOOGLE_CREDENTIALS = os.environ.get("GOOGLE_CREDENTIALS")
+OWNER_ID = int(os.environ.get("OWNER_ID", "0"))  # Tu ID de Discord
+
+intents = discord.Intents.default()
+intents.message_content = True
+bot = commands.Bot(command_prefix="!", intents=intents)
+
+# Hojas a ignorar
+IGNORAR_HOJAS = {"CARPETAS", "DIA DE SUBIDA"}
+
+# Archivos de datos
+ARCHIVO_HIATUS = "hiatus.json"
+ARCHIVO_SOLO = "solo.json"
+ARCHIVO_CALENDARIO = "calendario.json"
+ARCHIVO_PLAZOS = "plazos.json"
+ARCHIVO_ALIAS = "alias.json"
+ARCHIVO_EJECUCIONES = "ejecuciones.json"
+ARCHIVO_HISTORIAL = "historial.log"  # cambios de etapa, una línea por cambio (solo se agrega)
+ARCHIVO_HISTORIAL_RESUMEN = "historial.resumen"  # agregados hasta cierto byte del log
+ARCHIVO_CURSORES = "cursores.json"  # por obra: fila del próximo cap sin Temple y del primero listo
+ESCRITURA_DIFERIDA = float(os.environ.get("ESCRITURA_DIFERIDA", "2"))  # segundos para juntar escrituras
+ALMACENAMIENTO = os.environ.get("ALMACENAMIENTO", "json").lower()  # "json" o "sqlite"
+ARCHIVO_DB = os.environ.get("ARCHIVO_DB", "bot.db")
+
+# Caché del Excel (segundos)
+SNAPSHOT_TTL = int(os.environ.get("SNAPSHOT_TTL", "120"))  # cuánto se reutiliza lo leído
+TITULOS_TTL = int(os.environ.get("TITULOS_TTL", "900"))  # cada cuánto se relee la lista de hojas
+# "revision": pregunta a Drive si el Excel cambió antes de descargarlo
+# "hash": siempre descarga, pero solo re-procesa las hojas que cambiaron
+# "no": descarga y procesa todo cada vez
+DETECCION_CAMBIOS = os.environ.get("DETECCION_CAMBIOS", "revision").lower()
+# "columnas": tras la primera lectura, de cada hoja se piden solo las columnas que
+# usa el bot (cap, etapas, responsables); "completa": siempre la hoja entera
+LECTURA_HOJAS = os.environ.get("LECTURA_HOJAS", "columnas").lower()
+# Copia en disco del Excel ya procesado, para arrancar con caché ("" = no guardar)
+ARCHIVO_SNAPSHOT = os.environ.get("ARCHIVO_SNAPSHOT", "snapshot.bin")
+
+# Llamadas a Google fuera del loop de Discord
+SHEETS_HILOS = int(os.environ.get("SHEETS_HILOS", "4"))  # hilos para gspread
+SHEETS_TIMEOUT = float(os.environ.get("SHEETS_TIMEOUT", "30"))  # segundos por llamada
+SHEETS_CUOTA_MINUTO = float(os.environ.get("SHEETS_CUOTA_MINUTO", "60"))  # lecturas por minuto que deja Google
+SHEETS_RAFAGA = int(os.environ.get("SHEETS_RAFAGA", "10"))  # llamadas seguidas antes de frenar
+SHEETS_REINTENTOS = int(os.environ.get("SHEETS_REINTENTOS", "4"))  # reintentos ante 429 / 5xx
+SHEETS_CONCURRENCIA = int(os.environ.get("SHEETS_CONCURRENCIA", "4"))  # lecturas parciales en paralelo
+SHEETS_LOTE = int(os.environ.get("SHEETS_LOTE", "10"))  # hojas por pedido en una lectura parcial
+
+# Map de días en inglés -> español
+TRAD = {
+    "monday": "lunes",
+    "tuesday": "martes",
+    "wednesday": "miércoles",
+    "thursday": "jueves",
+    "friday": "viernes",
+    "saturday": "sábado",
+    "sunday": "domingo",
+}
+DIAS_VALIDOS = list(TRAD.values())
+
+# Recordatorios automáticos
+ZONA_HORARIA = os.environ.get("ZONA_HORARIA", "America/Lima")
+# "HH:MM" separados por coma; cada uno puede llevar su zona: "06:00,21:00@Europe/Madrid"
+HORARIOS_RECORDATORIO = os.environ.get("HORARIOS_RECORDATORIO", "06:00,18:00")
+HORARIO_RESUMEN = os.environ.get("HORARIO_RESUMEN", "18:00")  # el domingo a esta hora va el resumen
+RECUPERAR_HORAS = float(os.environ.get("RECUPERAR_HORAS", "6"))  # cuánto atrás se recupera un turno perdido
+
+# Webhook de cambios del Excel (Apps Script); sin token el endpoint queda apagado
+WEBHOOK_TOKEN = os.environ.get("WEBHOOK_TOKEN", "")
+WEBHOOK_AVISOS = os.environ.get("WEBHOOK_AVISOS", "0") == "1"  # avisar al momento RAW subidos y caps listos
+
+# Salud (/health): por encima de estos límites el endpoint responde 503
+SALUD_INTERVALO = float(os.environ.get("SALUD_INTERVALO", "5"))  # cada cuánto late el watchdog
+SALUD_MAX_LAG = float(os.environ.get("SALUD_MAX_LAG", "5"))  # segundos de atraso del loop
+SALUD_MAX_LATENCIA = float(os.environ.get("SALUD_MAX_LATENCIA", "10"))  # latencia del gateway de Discord
+SALUD_GRACIA = float(os.environ.get("SALUD_GRACIA", "120"))  # margen al arrancar antes de exigir conexión
+SALUD_MARGEN_RECORDATORIO = float(os.environ.get("SALUD_MARGEN_RECORDATORIO", "900"))  # atraso tolerado del recordatorio
+SALUD_MAX_SNAPSHOT = float(os.environ.get("SALUD_MAX_SNAPSHOT", "0"))  # edad máxima del Excel en caché (0 = sin límite)
+
+# =========================
+# HORA LOCAL Y HORARIOS
+# =========================
+def _zona_peru():
+    try:
+        return ZoneInfo("America/Lima")
+    except ZoneInfoNotFoundError:
+        return datetime.timezone(datetime.timedelta(hours=-5), "PET")  # sin base de zonas instalada
+
+def _zona(nombre, defecto=None):
+    """ZoneInfo de esa zona; si no existe, la de defecto (o la de Perú)."""
+    try:
+        return ZoneInfo(nombre)
+    except (ZoneInfoNotFoundError, ValueError):
+        if defecto is None:
+            print(f"⚠️ Zona horaria desconocida {nombre!r}, uso hora de Perú (UTC-5)")
+            return _zona_peru()
+        print(f"⚠️ Zona horaria desconocida {nombre!r}, uso {defecto}")
+        return defecto
+
+ZONA = _zona(ZONA_HORARIA)
+
+def ahora_local():
+    return datetime.datetime.now(ZONA)
+
+def _parsear_horarios(texto):
+    horarios = []
+    for parte in texto.split(","):
+        parte = parte.strip()
+        if not parte:
+            continue
+        hora, _, zona = parte.partition("@")
+        try:
+            h, m = (int(x) for x in hora.split(":"))
+            horarios.append(datetime.time(h, m, tzinfo=_zona(zona, ZONA) if zona else ZONA))
+        except ValueError:
+            print(f"⚠️ Horario inválido {parte!r}, lo ignoro")
+    return horarios or [datetime.time(6, tzinfo=ZONA), datetime.time(18, tzinfo=ZONA)]
+
+HORARIOS = _parsear_horarios(HORARIOS_RECORDATORIO)
+
+def ultimo_turno(ahora):
+    """El horario programado más reciente que ya pasó (datetime con zona)."""
+    candidatos = []
+    for horario in HORARIOS:
+        local = ahora.astimezone(horario.tzinfo)
+        for dias_atras in (0, 1):
+            fecha = local.date() - datetime.timedelta(days=dias_atras)
+            turno = datetime.datetime.combine(fecha, horario.replace(tzinfo=None), tzinfo=horario.tzinfo)
+            if turno <= ahora:
+                candidatos.append(turno)
+                break
+    return max(candidatos)
+
+def proximo_turno(ahora):
+    """El primer horario programado después de ahora (datetime con zona)."""
+    candidatos = []
+    for horario in HORARIOS:
+        local = ahora.astimezone(horario.tzinfo)
+        for dias_adelante in (0, 1):
+            fecha = local.date() + datetime.timedelta(days=dias_adelante)
+            turno = datetime.datetime.combine(fecha, horario.replace(tzinfo=None), tzinfo=horario.tzinfo)
+            if turno > ahora:
+                candidatos.append(turno)
+                break
+    return min(candidatos)
+
+# =========================
+# MÉTRICAS
+# =========================
+BUCKETS_SEGUNDOS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+def _escapar_etiqueta(valor):
+    return str(valor).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+class Metricas:
+    """
+    Contadores e histogramas en memoria. Se escriben desde el loop y desde los
+    hilos de Sheets y se leen desde Flask, por eso todo pasa por un lock.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.contadores = {}  # (nombre, etiquetas) -> valor
+        self.histogramas = {}  # (nombre, etiquetas) -> [cuenta por bucket..., +Inf, suma]
+
+    def incrementar(self, nombre, valor=1, **etiquetas):
+        clave = (nombre, tuple(sorted(etiquetas.items())))
+        with self.lock:
+            self.contadores[clave] = self.contadores.get(clave, 0) + valor
+
+    def observar(self, nombre, segundos, **etiquetas):
+        clave = (nombre, tuple(sorted(etiquetas.items())))
+        i = bisect.bisect_left(BUCKETS_SEGUNDOS, segundos)
+        with self.lock:
+            h = self.histogramas.get(clave)
+            if h is None:
+                h = self.histogramas[clave] = [0] * (len(BUCKETS_SEGUNDOS) + 1) + [0.0]
+            h[i] += 1
+            h[-1] += segundos
+
+    @contextlib.contextmanager
+    def medir(self, nombre, **etiquetas):
+        inicio = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observar(nombre, time.perf_counter() - inicio, **etiquetas)
+
+    def valor(self, nombre, **etiquetas):
+        with self.lock:
+            return self.contadores.get((nombre, tuple(sorted(etiquetas.items()))), 0)
+
+    def _copiar(self):
+        with self.lock:
+            return dict(self.contadores), {k: list(v) for k, v in self.histogramas.items()}
+
+    def prometheus(self):
+        contadores, histogramas = self._copiar()
+
+        def etiquetas_txt(etiquetas, extra=()):
+            pares = list(etiquetas) + list(extra)
+            if not pares:
+                return ""
+            return "{" + ",".join(f'{k}="{_escapar_etiqueta(v)}"' for k, v in pares) + "}"
+
+        lineas = []
+        vistos = set()
+        for (nombre, etiquetas), valor in sorted(contadores.items()):
+            if nombre not in vistos:
+                vistos.add(nombre)
+                lineas.append(f"# TYPE {nombre} counter")
+            lineas.append(f"{nombre}{etiquetas_txt(etiquetas)} {valor}")
+        for (nombre, etiquetas), h in sorted(histogramas.items()):
+            if nombre not in vistos:
+                vistos.add(nombre)
+                lineas.append(f"# TYPE {nombre} histogram")
+            acumulado = 0
+            for limite, cuenta in zip(BUCKETS_SEGUNDOS, h):
+                acumulado += cuenta
+                lineas.append(f"{nombre}_bucket{etiquetas_txt(etiquetas, [('le', limite)])} {acumulado}")
+            total = acumulado + h[len(BUCKETS_SEGUNDOS)]
+            lineas.append(f"{nombre}_bucket{etiquetas_txt(etiquetas, [('le', '+Inf')])} {total}")
+            lineas.append(f"{nombre}_sum{etiquetas_txt(etiquetas)} {h[-1]}")
+            lineas.append(f"{nombre}_count{etiquetas_txt(etiquetas)} {total}")
+        return "\n".join(lineas) + "\n"
+
+    def como_dict(self):
+        contadores, histogramas = self._copiar()
+        salida = {"contadores": [], "histogramas": []}
+        for (nombre, etiquetas), valor in sorted(contadores.items()):
+            salida["contadores"].append({"nombre": nombre, "etiquetas": dict(etiquetas), "valor": valor})
+        for (nombre, etiquetas), h in sorted(histogramas.items()):
+            total = sum(h[:-1])
+            salida["histogramas"].append({
+                "nombre": nombre,
+                "etiquetas": dict(etiquetas),
+                "total": total,
+                "suma": h[-1],
+                "promedio": h[-1] / total if total else None,
+            })
+        return salida
+
+metricas = Metricas()
+
+def tasa_aciertos_cache():
+    """Fracción de lecturas del Excel servidas sin descargar nada."""
+    aciertos = metricas.valor("bot_snapshot_total", resultado="cache")
+    aciertos += metricas.valor("bot_snapshot_total", resultado="sin_cambios")
+    total = aciertos + metricas.valor("bot_snapshot_total", resultado="descarga")
+    return aciertos / total if total else None
+
+# =========================
+# SERVIDOR WEB 24/7 (ANTI-SLEEP)
+# =========================
+app = Flask("")
+
+@app.route("/")
+def home():
+    return "Bot activo 24/7"
+
+@app.route("/metrics")
+def metrics():
+    return Response(metricas.prometheus(), mimetype="text/plain; version=0.0.4")
+
+@app.route("/metrics.json")
+def metrics_json():
+    datos = metricas.como_dict()
+    datos["tasa_aciertos_cache"] = tasa_aciertos_cache()
+    return jsonify(datos)
+
+def run_web():
+    app.run(host="0.0.0.0", port=10000)
+
+def mantener_vivo():
+    t = Thread(target=run_web)
+    t.daemon = True
+    t.start()
+
+# =========================
+# UTILIDADES DE ARCHIVOS
+# =========================
+# Cada JSON se lee una sola vez y después se sirve desde memoria. Las escrituras
+# se juntan y se vuelcan en segundo plano (temporal + rename), así un corte a
+# mitad de escritura nunca deja el archivo truncado.
+_estado = {}
+_versiones = {}
+_pendientes = set()
+_escritor = {"tarea": None}
+
+def cargar(archivo, defecto):
+    if archivo not in _estado:
+        if ALMACENAMIENTO == "sqlite":
+            with metricas.medir("bot_archivos_segundos", operacion="leer", archivo=archivo):
+                _estado[archivo] = almacen_sqlite().cargar(archivo, defecto)
+        elif os.path.exists(archivo):
+            with metricas.medir("bot_archivos_segundos", operacion="leer", archivo=archivo):
+                with open(archivo, "r", encoding="utf-8") as f:
+                    _estado[archivo] = json.load(f)
+        else:
+            _estado[archivo] = defecto
+    return _estado[archivo]
+
+def guardar(archivo, data):
+    _estado[archivo] = data
+    _versiones[archivo] = _versiones.get(archivo, 0) + 1
+    _pendientes.add(archivo)
+    _programar_escritura()
+
+def version_estado(archivo):
+    """Cambia cada vez que se guarda el archivo (sirve para saber si hay que recalcular algo)."""
+    return _versiones.get(archivo, 0)
+
+def _escribir_atomico(archivo, texto):
+    tmp = f"{archivo}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        f.write(texto)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, archivo)
+
+def _serializar_pendientes():
+    # Se serializa en el loop, donde nadie está modificando los datos a la vez
+    lote = [(a, json.dumps(_estado[a], indent=2, ensure_ascii=False)) for a in _pendientes]
+    _pendientes.clear()
+    return lote
+
+def _escribir_lote(lote):
+    for archivo, texto in lote:
+        with metricas.medir("bot_archivos_segundos", operacion="escribir", archivo=archivo):
+            if ALMACENAMIENTO == "sqlite":
+                almacen_sqlite().guardar(archivo, json.loads(texto))
+            else:
+                _escribir_atomico(archivo, texto)
+
+async def _escritura_diferida():
+    while _pendientes:
+        await asyncio.sleep(ESCRITURA_DIFERIDA)
+        lote = _serializar_pendientes()
+        try:
+            await asyncio.to_thread(_escribir_lote, lote)
+        except (OSError, sqlite3.Error) as e:
+            print(f"❌ No pude guardar {[a for a, _ in lote]}: {e}")
+            _pendientes.update(a for a, _ in lote)
+
+def _programar_escritura():
+    try:
+        loop = asyncio.get_running_loop()
+    except RuntimeError:
+        # Fuera del bot (scripts, apagado): se escribe en el momento
+        volcar_estado()
+        return
+    tarea = _escritor["tarea"]
+    if tarea is None or tarea.done():
+        _escritor["tarea"] = loop.create_task(_escritura_diferida())
+
+def volcar_estado():
+    """Escribe ya todo lo pendiente."""
+    _escribir_lote(_serializar_pendientes())
+    historial.guardar_resumen()
+
+atexit.register(volcar_estado)
+
+# =========================
+# ALMACENAMIENTO SQLITE (OPCIONAL)
+# =========================
+# Con ALMACENAMIENTO=sqlite el estado vive en tablas en vez de en los JSON.
+# cargar/guardar siguen funcionando igual: la memoria sigue siendo la fuente de
+# verdad y cada guardar se aplica en una sola transacción (nunca a medias).
+ESQUEMA_SQLITE = """
+CREATE TABLE IF NOT EXISTS plazos (
+    obra TEXT NOT NULL,
+    cap TEXT NOT NULL,
+    persona TEXT NOT NULL,
+    fecha TEXT NOT NULL,
+    PRIMARY KEY (obra, cap)
+);
+
+CREATE TABLE IF NOT EXISTS calendario (
+    obra TEXT PRIMARY KEY,
+    tipo TEXT NOT NULL,
+    valor TEXT NOT NULL,
+    orden INTEGER NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS alias (
+    corto TEXT PRIMARY KEY,
+    completo TEXT NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS listas (
+    lista TEXT NOT NULL,
+    obra TEXT NOT NULL,
+    orden INTEGER NOT NULL,
+    PRIMARY KEY (lista, obra)
+);
+
+CREATE TABLE IF NOT EXISTS documentos (
+    archivo TEXT PRIMARY KEY,
+    contenido TEXT NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS meta (
+    clave TEXT PRIMARY KEY,
+    valor TEXT
+);
+"""
+
+def _fecha_plazo(texto):
+    """'YYYY-MM-DD' normalizada o None si el texto no es una fecha válida."""
+    try:
+        return datetime.datetime.strptime(texto, "%Y-%m-%d").date().isoformat()
+    except (TypeError, ValueError):
+        return None
+
+class AlmacenSQLite:
+    """Estado del bot en SQLite. Traduce cada archivo de datos a su tabla."""
+
+    def __init__(self, ruta):
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(ruta, check_same_thread=False, isolation_level=None)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.executescript(ESQUEMA_SQLITE)
+
+    def _transaccion(self, func, *args):
+        with self.lock:
+            self.conn.execute("BEGIN IMMEDIATE")
+            try:
+                resultado = func(*args)
+            except Exception:
+                self.conn.execute("ROLLBACK")
+                raise
+            self.conn.execute("COMMIT")
+            return resultado
+
+    # ---- lectura ----
+    def cargar(self, archivo, defecto):
+        with self.lock:
+            c = self.conn
+            if archivo == ARCHIVO_PLAZOS:
+                data = {}
+                for obra, cap, persona, fecha in c.execute(
+                        "SELECT obra, cap, persona, fecha FROM plazos ORDER BY rowid"):
+                    data.setdefault(obra, {})[cap] = {"persona": persona, "fecha": fecha}
+                return data
+            if archivo == ARCHIVO_CALENDARIO:
+                return {
+                    obra: {"tipo": tipo, "valor": json.loads(valor)}
+                    for obra, tipo, valor in c.execute(
+                        "SELECT obra, tipo, valor FROM calendario ORDER BY orden")
+                }
+            if archivo == ARCHIVO_ALIAS:
+                return dict(c.execute("SELECT corto, completo FROM alias ORDER BY rowid"))
+            if archivo in (ARCHIVO_HIATUS, ARCHIVO_SOLO):
+                return [obra for (obra,) in c.execute(
+                    "SELECT obra FROM listas WHERE lista = ? ORDER BY orden", (archivo,))]
+            fila = c.execute(
+                "SELECT contenido FROM documentos WHERE archivo = ?", (archivo,)).fetchone()
+            return json.loads(fila[0]) if fila else defecto
+
+    # ---- escritura ----
+    def guardar(self, archivo, data):
+        if archivo == ARCHIVO_PLAZOS:
+            self._transaccion(self._guardar_plazos, data)
+        elif archivo == ARCHIVO_CALENDARIO:
+            self._transaccion(self._guardar_calendario, data)
+        elif archivo == ARCHIVO_ALIAS:
+            self._transaccion(self._guardar_alias, data)
+        elif archivo in (ARCHIVO_HIATUS, ARCHIVO_SOLO):
+            self._transaccion(self._guardar_lista, archivo, data)
+        else:
+            self._transaccion(self._guardar_documento, archivo, data)
+
+    # Cada _guardar_* compara con lo que ya hay y solo toca las filas que cambiaron
+    def _guardar_plazos(self, data):
+        c = self.conn
+        actuales = {
+            (obra, cap): (persona, fecha)
+            for obra, cap, persona, fecha in c.execute("SELECT obra, cap, persona, fecha FROM plazos")
+        }
+        nuevos = {
+            (obra, cap): (info["persona"], info["fecha"])
+            for obra, caps in data.items()
+            for cap, info in caps.items()
+        }
+        c.executemany("DELETE FROM plazos WHERE obra = ? AND cap = ?",
+                      [k for k in actuales if k not in nuevos])
+        c.executemany(
+            "INSERT INTO plazos (obra, cap, persona, fecha) VALUES (?, ?, ?, ?) "
+            "ON CONFLICT (obra, cap) DO UPDATE SET "
+            "persona = excluded.persona, fecha = excluded.fecha",
+            [(obra, cap, persona, fecha)
+             for (obra, cap), (persona, fecha) in nuevos.items()
+             if actuales.get((obra, cap)) != (persona, fecha)],
+        )
+
+    def _guardar_calendario(self, data):
+        c = self.conn
+        actuales = {
+            obra: (tipo, valor, orden)
+            for obra, tipo, valor, orden in c.execute("SELECT obra, tipo, valor, orden FROM calendario")
+        }
+        c.executemany("DELETE FROM calendario WHERE obra = ?",
+                      [(obra,) for obra in actuales if obra not in data])
+        for orden, (obra, datos) in enumerate(data.items()):
+            fila = (datos.get("tipo"), json.dumps(datos.get("valor"), ensure_ascii=False), orden)
+            if actuales.get(obra) == fila:
+                continue
+            c.execute(
+                "INSERT INTO calendario (obra, tipo, valor, orden) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT (obra) DO UPDATE SET "
+                "tipo = excluded.tipo, valor = excluded.valor, orden = excluded.orden",
+                (obra,) + fila,
+            )
+
+    def _guardar_alias(self, data):
+        c = self.conn
+        actuales = dict(c.execute("SELECT corto, completo FROM alias"))
+        c.executemany("DELETE FROM alias WHERE corto = ?",
+                      [(k,) for k in actuales if k not in data])
+        c.executemany(
+            "INSERT INTO alias (corto, completo) VALUES (?, ?) "
+            "ON CONFLICT (corto) DO UPDATE SET completo = excluded.completo",
+            [(k, v) for k, v in data.items() if actuales.get(k) != v],
+        )
+
+    def _guardar_lista(self, lista, data):
+        self.conn.execute("DELETE FROM listas WHERE lista = ?", (lista,))
+        self.conn.executemany(
+            "INSERT OR IGNORE INTO listas (lista, obra, orden) VALUES (?, ?, ?)",
+            [(lista, obra, i) for i, obra in enumerate(data)],
+        )
+
+    def _guardar_documento(self, archivo, data):
+        self.conn.execute(
+            "INSERT INTO documentos (archivo, contenido) VALUES (?, ?) "
+            "ON CONFLICT (archivo) DO UPDATE SET contenido = excluded.contenido",
+            (archivo, json.dumps(data, ensure_ascii=False)),
+        )
+
+    def migrar_desde_json(self):
+        """Copia una sola vez los JSON existentes a la base."""
+        with self.lock:
+            if self.conn.execute("SELECT 1 FROM meta WHERE clave = 'migrado_json'").fetchone():
+                return
+        migrados = []
+        for archivo in (ARCHIVO_HIATUS, ARCHIVO_SOLO, ARCHIVO_CALENDARIO, ARCHIVO_PLAZOS, ARCHIVO_ALIAS):
+            if os.path.exists(archivo):
+                with open(archivo, "r", encoding="utf-8") as f:
+                    self.guardar(archivo, json.load(f))
+                migrados.append(archivo)
+        with self.lock:
+            self.conn.execute("INSERT OR REPLACE INTO meta (clave, valor) VALUES ('migrado_json', ?)",
+                              (datetime.datetime.utcnow().isoformat(),))
+        if migrados:
+            print(f"📦 Migrados a {ARCHIVO_DB}: {', '.join(migrados)}")
+
+_almacen = []
+
+def almacen_sqlite():
+    """Abre la base (y migra los JSON) la primera vez que se necesita."""
+    if not _almacen:
+        almacen = AlmacenSQLite(ARCHIVO_DB)
+        almacen.migrar_desde_json()
+        _almacen.append(almacen)
+    return _almacen[0]
+
+# =========================
+# UTILIDADES DE RESPUESTA
+# =========================
+LIMITE_MENSAJE = 2000  # máximo de caracteres por mensaje en Discord
+
+def partir_mensaje(texto: str, limite: int = LIMITE_MENSAJE):
+    """Corta un texto en partes de hasta `limite` caracteres, siempre por saltos de línea."""
+    if len(texto) <= limite:
+        return [texto] if texto.strip() else []
+
+    partes, actual = [], None
+    for linea in texto.split("\n"):
+        # Una línea sola más larga que el límite no tiene más remedio que cortarse
+        while len(linea) > limite:
+            if actual is not None:
+                partes.append(actual)
+                actual = None
+            partes.append(linea[:limite])
+            linea = linea[limite:]
+        if actual is None:
+            actual = linea
+        elif len(actual) + 1 + len(linea) <= limite:
+            actual += "\n" + linea
+        else:
+            partes.append(actual)
+            actual = linea
+    if actual is not None:
+        partes.append(actual)
+    return [p for p in partes if p.strip()]
+
+def empaquetar(mensajes, limite: int = LIMITE_MENSAJE):
+    """Junta varios mensajes en la menor cantidad posible de envíos de hasta `limite`."""
+    envios = []
+    for msg in mensajes:
+        for parte in partir_mensaje(msg, limite):
+            if envios and len(envios[-1]) + 2 + len(parte) <= limite:
+                envios[-1] += "\n\n" + parte
+            else:
+                envios.append(parte)
+    return envios
+
+async def responder(ctx, msg: str):
+    for parte in partir_mensaje(msg):
+        metricas.incrementar("bot_discord_llamadas_total", ruta="send")
+        await ctx.send(parte)
+
+_canal_dueño = {}
+
+async def canal_dueño():
+    """Canal de DM con el dueño; se resuelve una sola vez (fetch_user es una llamada HTTP)."""
+    if "canal" not in _canal_dueño:
+        user = bot.get_user(OWNER_ID)
+        if user is None:
+            metricas.incrementar("bot_discord_llamadas_total", ruta="fetch_user")
+            user = await bot.fetch_user(OWNER_ID)
+        if user.dm_channel is None:
+            metricas.incrementar("bot_discord_llamadas_total", ruta="create_dm")
+            await user.create_dm()
+        _canal_dueño["canal"] = user.dm_channel
+    return _canal_dueño["canal"]
+
+async def enviar_dm(*mensajes: str):
+    """
+    Manda uno o varios mensajes al dueño en la menor cantidad de envíos.
+    Se mandan de a uno: discord.py ya espera lo necesario según los límites de cada ruta.
+    """
+    canal = await canal_dueño()
+    for envio in empaquetar(mensajes):
+        metricas.incrementar("bot_discord_llamadas_total", ruta="send_dm")
+        await canal.send(envio)
+
+# =========================
+# ALIAS DE OBRAS
+# =========================
+def resolver_obra(nombre_entrada: str, difuso=False) -> str:
+    """
+    Alias -> nombre real. Si no es un alias, busca el nombre en el índice sin
+    importar mayúsculas, tildes ni signos; con difuso=True también acepta el
+    comienzo del nombre si solo hay una obra que empiece así (solo para
+    comandos que leen: los que escriben piden el nombre completo o un alias).
+    """
+    alias = cargar(ARCHIVO_ALIAS, {})
+    if nombre_entrada in alias:
+        return alias[nombre_entrada]
+    indice = indice_nombres()
+    if difuso:
+        encontrado = indice.buscar(nombre_entrada)
+    else:
+        encontrado = indice.exactos.get(normalizar_nombre(nombre_entrada))
+    return encontrado or nombre_entrada
+
+# =========================
+# ÍNDICE DE NOMBRES DE OBRAS
+# =========================
+# Hojas del Excel + obras del calendario + alias, normalizados. Resuelve nombres
+# y sugiere parecidos sin ir a Google. Se rearma solo cuando cambia alguna fuente.
+def normalizar_nombre(texto):
+    """Minúsculas, sin tildes ni signos: 'Él Héroe!!' -> 'el heroe'."""
+    texto = unicodedata.normalize("NFKD", texto)
+    texto = "".join(ch for ch in texto if not unicodedata.combining(ch)).casefold()
+    return " ".join("".join(ch if ch.isalnum() else " " for ch in texto).split())
+
+def _trigramas(clave):
+    t = f"  {clave} "
+    return {t[i:i + 3] for i in range(len(t) - 2)}
+
+class IndiceNombres:
+    """Trie de prefijos y trigramas sobre los nombres normalizados."""
+    __slots__ = ("exactos", "trie", "trigramas", "tamaños")
+
+    def __init__(self, nombres, alias):
+        self.exactos = {}  # normalizado -> nombre real
+        self.trie = {}  # letra -> subárbol; "" -> claves que terminan ahí
+        self.trigramas = {}  # trigrama -> claves que lo tienen
+        self.tamaños = {}  # clave -> cantidad de trigramas
+        for nombre in nombres:
+            self._agregar(normalizar_nombre(nombre), nombre)
+        for corto, completo in alias.items():
+            self._agregar(normalizar_nombre(corto), completo)
+
+    def _agregar(self, clave, nombre):
+        if not clave or clave in self.exactos:
+            return
+        self.exactos[clave] = nombre
+        nodo = self.trie
+        for ch in clave:
+            nodo = nodo.setdefault(ch, {})
+        nodo.setdefault("", []).append(clave)
+        trigramas = _trigramas(clave)
+        self.tamaños[clave] = len(trigramas)
+        for t in trigramas:
+            self.trigramas.setdefault(t, []).append(clave)
+
+    def con_prefijo(self, prefijo):
+        if not prefijo:
+            return []
+        nodo = self.trie
+        for ch in prefijo:
+            nodo = nodo.get(ch)
+            if nodo is None:
+                return []
+        claves, pendientes = [], [nodo]
+        while pendientes:
+            nodo = pendientes.pop()
+            claves.extend(nodo.get("", ()))
+            pendientes.extend(hijo for letra, hijo in nodo.items() if letra)
+        return claves
+
+    def buscar(self, nombre):
+        """Nombre real por coincidencia exacta o por prefijo de una sola obra; si no, None."""
+        clave = normalizar_nombre(nombre)
+        if clave in self.exactos:
+            return self.exactos[clave]
+        reales = {self.exactos[c] for c in self.con_prefijo(clave)}
+        return reales.pop() if len(reales) == 1 else None
+
+    def sugerencias(self, nombre, cuantas=3, minimo=0.3):
+        """Nombres reales más parecidos (primero los que empiezan igual, después por trigramas)."""
+        clave = normalizar_nombre(nombre)
+        propios = _trigramas(clave)
+        comunes = Counter()
+        for t in propios:
+            comunes.update(self.trigramas.get(t, ()))
+        puntajes = {c: 2 * n / (len(propios) + self.tamaños[c]) for c, n in comunes.items()}
+        for c in self.con_prefijo(clave):
+            puntajes[c] = 1.0 + puntajes.get(c, 0)
+        resultado = []
+        for c, puntaje in sorted(puntajes.items(), key=lambda item: -item[1]):
+            if puntaje < minimo or len(resultado) == cuantas:
+                break
+            if self.exactos[c] not in resultado:
+                resultado.append(self.exactos[c])
+        return resultado
+
+_indice_nombres = {"version": None, "indice": IndiceNombres([], {})}
+
+def indice_nombres():
+    version = (version_estado(ARCHIVO_ALIAS), version_estado(ARCHIVO_CALENDARIO), _snapshot["titulos"])
+    if _indice_nombres["version"] != version:
+        nombres = list(_snapshot["titulos"]) + list(cargar(ARCHIVO_CALENDARIO, {}))
+        _indice_nombres["indice"] = IndiceNombres(nombres, cargar(ARCHIVO_ALIAS, {}))
+        _indice_nombres["version"] = version
+    return _indice_nombres["indice"]
+
+def obra_conocida(obra):
+    """False solo si ya sabemos qué hojas hay y la obra no es una (así no se va a Google en vano)."""
+    return not _snapshot["titulos"] or obra in _snapshot["titulos"]
+
+def mensaje_obra_no_encontrada(obra):
+    msg = f"❌ No encontré la obra {obra} en el Excel."
+    sugerencias = indice_nombres().sugerencias(obra)
+    if sugerencias:
+        msg += f"\n¿Quisiste decir: {', '.join(sugerencias)}?"
+    return msg
+
+@bot.command()
+async def alias(ctx, corto, *, completo):
+    data = cargar(ARCHIVO_ALIAS, {})
+    data[corto] = completo
+    guardar(ARCHIVO_ALIAS, data)
+    await responder(ctx, f"✅ Alias agregado:\n{corto} → {completo}")
+
+@bot.command()
+async def ver_alias(ctx):
+    data = cargar(ARCHIVO_ALIAS, {})
+    if not data:
+        await responder(ctx, "📂 No hay alias registrados.")
+        return
+    msg = "📂 ALIAS:\n"
+    for corto, largo in data.items():
+        msg += f"- {corto} → {largo}\n"
+    await responder(ctx, msg)
+
+# =========================
+# ESQUEMA DE COLUMNAS Y CAPÍTULOS
+# =========================
+# Clave interna -> encabezado (fila 2 de cada hoja, en minúsculas)
+COLUMNAS = {
+    "raw": "raw subida",
+    "trad": "trad. listo",
+    "clean": "clean listo",
+    "type": "type listo",
+    "temple": "subido a temple",
+    "traductor": "traductor",
+    "cleaner": "cleaner",
+    "typer": "typer",
+}
+ETAPAS = ("raw", "trad", "clean", "type", "temple")
+RESPONSABLES = ("traductor", "cleaner", "typer")
+
+_avisos_esquema = set()
+
+class Esquema:
+    """Índice de cada columna conocida en una hoja (None si la hoja no la tiene)."""
+    __slots__ = tuple(COLUMNAS)
+
+    def __init__(self, encabezados):
+        indices = {}
+        for i, h in enumerate(encabezados):
+            indices.setdefault(h.lower().strip(), i)
+        for clave, nombre in COLUMNAS.items():
+            setattr(self, clave, indices.get(nombre))
+
+    def tiene(self, *claves):
+        return all(getattr(self, c) is not None for c in claves)
+
+    def faltantes(self):
+        return [nombre for clave, nombre in COLUMNAS.items() if getattr(self, clave) is None]
+
+    def a_tupla(self):
+        return tuple(getattr(self, clave) for clave in COLUMNAS)
+
+    @classmethod
+    def desde_tupla(cls, indices):
+        esquema = cls.__new__(cls)
+        for clave, indice in zip(COLUMNAS, indices):
+            setattr(esquema, clave, indice)
+        return esquema
+
+class Capitulo:
+    """Una fila de capítulo ya interpretada: etapas como bool, responsables como texto."""
+    __slots__ = ("cap", "fila") + ETAPAS + RESPONSABLES
+
+    def __init__(self, esquema, numero_fila, valores):
+        def celda(idx):
+            if idx is None or idx >= len(valores):
+                return ""
+            return valores[idx]
+
+        self.cap = valores[0]
+        self.fila = numero_fila  # fila real en el Excel (1 = primera)
+        for etapa in ETAPAS:
+            setattr(self, etapa, celda(getattr(esquema, etapa)) == "✅")
+        for rol in RESPONSABLES:
+            setattr(self, rol, celda(getattr(esquema, rol)).strip())
+
+    def a_tupla(self):
+        return tuple(getattr(self, campo) for campo in Capitulo.__slots__)
+
+    @classmethod
+    def desde_tupla(cls, valores):
+        capitulo = cls.__new__(cls)
+        for campo, valor in zip(cls.__slots__, valores):
+            setattr(capitulo, campo, valor)
+        return capitulo
+
+class Hoja:
+    """Hoja de una obra: su esquema y sus capítulos en orden."""
+    __slots__ = ("titulo", "esquema", "capitulos", "por_cap", "derivados")
+
+    def __init__(self, titulo, esquema, capitulos):
+        self.titulo = titulo
+        self.esquema = esquema
+        self.capitulos = capitulos
+        # Resultados calculados sobre esta hoja; como una hoja que no cambió se
+        # reutiliza tal cual entre snapshots, no se vuelven a calcular
+        self.derivados = {}
+        self.por_cap = {}
+        for c in capitulos:
+            self.por_cap.setdefault(c.cap, c)
+
+def parsear_hoja(titulo, datos):
+    """Convierte las filas crudas de una hoja en Hoja. Sin esquema si tiene menos de 3 filas."""
+    if len(datos) < 3:
+        return Hoja(titulo, None, [])
+
+    esquema = Esquema(datos[1])
+    faltan = tuple(esquema.faltantes())
+    if faltan and (titulo, faltan) not in _avisos_esquema:
+        _avisos_esquema.add((titulo, faltan))
+        print(f"⚠️ La hoja {titulo} no tiene las columnas: {', '.join(faltan)}")
+
+    capitulos = [
+        Capitulo(esquema, i, fila)
+        for i, fila in enumerate(datos[2:], start=3)
+        if fila and fila[0]
+    ]
+    return Hoja(titulo, esquema, capitulos)
+
+# =========================
+# CONEXIÓN CON GOOGLE
+# =========================
+# Nada se conecta al importar: el Excel se abre la primera vez que hace falta
+# (o en segundo plano tras on_ready) y la conexión queda para los reintentos de
+# bot.run. Si Google falla, el bot arranca igual y se reintenta en el próximo uso.
+_conexion = {"excel": None, "precarga": None}
+_lock_conexion = threading.Lock()
+
+CODIGOS_REINTENTABLES = {429, 500, 502, 503, 504}
+
+class CubetaTokens:
+    """
+    Token bucket: deja pasar hasta `capacidad` llamadas seguidas y después
+    `por_segundo`. Los tokens pueden quedar en negativo: cada llamada reserva
+    su turno y espera lo que le toca, en orden de llegada.
+    """
+    __slots__ = ("capacidad", "por_segundo", "tokens", "actualizado", "lock")
+
+    def __init__(self, capacidad, por_segundo):
+        self.capacidad = capacidad
+        self.por_segundo = por_segundo
+        self.tokens = float(capacidad)
+        self.actualizado = time.monotonic()
+        self.lock = threading.Lock()
+
+    def reservar(self):
+        """Toma un token y devuelve cuántos segundos hay que esperar para usarlo."""
+        with self.lock:
+            ahora = time.monotonic()
+            self.tokens = min(self.capacidad, self.tokens + (ahora - self.actualizado) * self.por_segundo)
+            self.actualizado = ahora
+            self.tokens -= 1
+            return 0.0 if self.tokens >= 0 else -self.tokens / self.por_segundo
+
+_cubeta = CubetaTokens(SHEETS_RAFAGA, SHEETS_CUOTA_MINUTO / 60)
+
+def es_reintentable(e):
+    return isinstance(e, gspread.exceptions.APIError) and e.code in CODIGOS_REINTENTABLES
+
+def _espera_reintento(e, intento):
+    """Lo que pida Google (Retry-After) o backoff exponencial con jitter, hasta 32s."""
+    try:
+        return float(e.response.headers["Retry-After"])
+    except (AttributeError, KeyError, TypeError, ValueError):
+        return min(2 ** intento, 32) + random.random()
+
+def llamar_api(metodo, func, *args, **kwargs):
+    """
+    Toda llamada a Google pasa por acá: respeta la cuota por minuto, reintenta
+    los 429 / 5xx con backoff y deja todo contado y medido. Bloqueante.
+    """
+    for intento in range(SHEETS_REINTENTOS + 1):
+        espera = _cubeta.reservar()
+        if espera:
+            metricas.observar("bot_sheets_espera_cuota_segundos", espera)
+            time.sleep(espera)
+        metricas.incrementar("bot_sheets_llamadas_total", metodo=metodo)
+        try:
+            with metricas.medir("bot_sheets_segundos", metodo=metodo):
+                return func(*args, **kwargs)
+        except gspread.exceptions.APIError as e:
+            metricas.incrementar("bot_sheets_errores_total", metodo=metodo, codigo=e.code)
+            if e.code not in CODIGOS_REINTENTABLES or intento == SHEETS_REINTENTOS:
+                raise
+            time.sleep(_espera_reintento(e, intento))
+        except Exception:
+            metricas.incrementar("bot_sheets_errores_total", metodo=metodo, codigo="red")
+            raise
+
+def excel():
+    """El Spreadsheet de gspread, abierto una sola vez (bloqueante: llamar desde un hilo)."""
+    if _conexion["excel"] is None:
+        with _lock_conexion:
+            if _conexion["excel"] is None:
+                gc = gspread.service_account_from_dict(json.loads(GOOGLE_CREDENTIALS))
+                _conexion["excel"] = llamar_api("open_by_url", gc.open_by_url, GOOGLE_SHEETS_URL)
+    return _conexion["excel"]
+
+# =========================
+# SNAPSHOT DEL EXCEL (CACHÉ)
+# =========================
+_snapshot = {
+    "hojas": {},
+    "cargado": 0.0,
+    "titulos": [],
+    "titulos_cargado": 0.0,
+    "revision": None,  # modifiedTime de Drive de la última descarga
+    "huellas": {},  # hash del contenido de cada hoja
+    "cambiadas": set(),  # hojas re-procesadas en la última actualización
+    "desde_disco": False,  # cargado de ARCHIVO_SNAPSHOT y todavía sin comparar con Google
+    "frescas": {},  # hoja -> (cuándo, revisión) de las releídas sueltas con el snapshot vencido
+}
+_sin_revision = []  # se llena si Drive no deja leer la revisión (y pasamos a "hash")
+_lock_snapshot = threading.Lock()
+
+def _titulos_hojas(forzar=False):
+    """Nombres de las hojas a leer (sin las ignoradas). Casi nunca cambian, así que van aparte."""
+    ahora = time.time()
+    if forzar or not _snapshot["titulos"] or ahora - _snapshot["titulos_cargado"] > TITULOS_TTL:
+        _snapshot["titulos"] = [
+            h.title for h in llamar_api("worksheets", excel().worksheets) if h.title not in IGNORAR_HOJAS
+        ]
+        _snapshot["titulos_cargado"] = ahora
+    return _snapshot["titulos"]
+
+def _huella(valores):
+    h = hashlib.blake2b(digest_size=16)
+    for fila in valores:
+        h.update("\x1f".join(fila).encode("utf-8"))
+        h.update(b"\x1e")
+    return h.digest()
+
+def _revision_actual():
+    """modifiedTime del Excel según Drive, o None si no se puede consultar."""
+    if DETECCION_CAMBIOS != "revision" or _sin_revision:
+        return None
+    try:
+        return llamar_api("drive_modifiedTime", excel().get_lastUpdateTime)
+    except gspread.exceptions.APIError as e:
+        if es_reintentable(e):
+            return None  # Drive no responde ahora: esta vez se descarga igual
+        # Sin permiso de Drive: seguimos solo con hashes
+        _sin_revision.append(e)
+        print(f"⚠️ No pude leer la revisión del Excel en Drive, uso solo hashes: {e}")
+        return None
+
+# Quienes quieran enterarse de cada capítulo que cambió se anotan acá. Reciben
+# (titulo, [(antes, despues), ...]) con Capitulo o None (cap nuevo / borrado).
+# Se llaman desde el hilo que descargó el Excel o desde el loop (parches).
+_observadores_hojas = []
+
+def diferencias(antes, despues):
+    """Pares (antes, despues) de los capítulos distintos entre dos versiones de una hoja."""
+    viejos = antes.por_cap if antes else {}
+    nuevos = despues.por_cap if despues else {}
+    pares = []
+    for cap, capitulo in nuevos.items():
+        previo = viejos.get(cap)
+        if previo is None or previo.a_tupla() != capitulo.a_tupla():
+            pares.append((previo, capitulo))
+    for cap, previo in viejos.items():
+        if cap not in nuevos:
+            pares.append((previo, None))
+    return pares
+
+def notificar_cambios(titulo, cambios):
+    if cambios:
+        for observador in _observadores_hojas:
+            observador(titulo, cambios)
+
+# Lectura por columnas: con los encabezados (fila 2) de la lectura anterior se
+# sabe qué columnas pedir. Cada pedido trae también la fila 2 para confirmar
+# que nadie movió columnas; si cambió, esa hoja se vuelve a pedir entera.
+_encabezados = {}  # hoja -> fila 2 tal como vino de Google
+
+def _columna_a1(indice):
+    """0 -> 'A', 27 -> 'AB'."""
+    return rowcol_to_a1(1, indice + 1)[:-1]
+
+def _tramos_columnas(encabezados):
+    """Tramos (desde, hasta) de columnas seguidas que necesita el bot, según la fila 2."""
+    esquema = Esquema(encabezados)
+    columnas = sorted({0} | {getattr(esquema, clave) for clave in COLUMNAS} - {None})
+    tramos = []
+    for c in columnas:
+        if tramos and tramos[-1][1] == c - 1:
+            tramos[-1][1] = c
+        else:
+            tramos.append([c, c])
+    return tramos
+
+def _armar_filas(encabezados, tramos, rangos):
+    """Reconstruye las filas (con la fila 2 y una fila 1 vacía) a partir de los tramos leídos."""
+    ancho = tramos[-1][1] + 1
+    filas = []
+    for (desde, _), rango in zip(tramos, rangos):
+        for i, valores in enumerate(rango.get("values", [])):
+            while len(filas) <= i:
+                filas.append([""] * ancho)
+            filas[i][desde:desde + len(valores)] = valores
+    return [[""], list(encabezados)] + filas
+
+def _descargar_valores(titulos):
+    """{hoja: filas} de varias hojas en un solo values_batch_get (proyectado si se puede)."""
+    rangos, planes = [], []
+    for titulo in titulos:
+        encabezados = _encabezados.get(titulo) if LECTURA_HOJAS == "columnas" else None
+        if not encabezados:
+            planes.append((titulo, None, 1))
+            rangos.append(absolute_range_name(titulo))
+            continue
+        tramos = _tramos_columnas(encabezados)
+        planes.append((titulo, tramos, 1 + len(tramos)))
+        rangos.append(absolute_range_name(titulo, "2:2"))
+        rangos.extend(
+            absolute_range_name(titulo, f"{_columna_a1(desde)}3:{_columna_a1(hasta)}") for desde, hasta in tramos
+        )
+
+    resp = llamar_api("values_batch_get", excel().values_batch_get, rangos)
+    respuestas = resp.get("valueRanges", [])
+    metricas.incrementar(
+        "bot_sheets_celdas_total", sum(len(f) for r in respuestas for f in r.get("values", ()))
+    )
+
+    valores, movidas = {}, []
+    i = 0
+    for titulo, tramos, cuantos in planes:
+        partes = respuestas[i:i + cuantos]
+        i += cuantos
+        if tramos is None:
+            filas = partes[0].get("values", []) if partes else []
+            valores[titulo] = fill_gaps(filas) if filas else []
+            if len(filas) > 1:
+                _encabezados[titulo] = filas[1]
+            continue
+        encabezados = (partes[0].get("values") or [[]])[0] if partes else []
+        if encabezados != _encabezados.get(titulo):
+            _encabezados.pop(titulo, None)
+            movidas.append(titulo)  # cambiaron los encabezados: esa hoja va entera
+            continue
+        valores[titulo] = _armar_filas(encabezados, tramos, partes[1:])
+    if movidas:
+        valores.update(_descargar_valores(movidas))
+    return {titulo: valores[titulo] for titulo in titulos}
+
+def _leer_hojas(titulos, completo=True):
+    """
+    Trae los valores de varias hojas en un solo values_batch_get y los procesa.
+    Devuelve (hojas, huellas, cambiadas).
+    """
+    if not titulos:
+        return {}, {}, set()
+    return _procesar_hojas(_descargar_valores(titulos), completo)
+
+def _procesar_hojas(descargadas, completo=True):
+    """
+    Compara lo descargado con el snapshot actual (llamar con _lock_snapshot tomado)
+    y avisa los cambios. Las hojas cuyo contenido no cambió reutilizan la Hoja ya
+    procesada. completo=False: son solo algunas hojas (las demás no se dan por borradas).
+    """
+    previas = _snapshot["hojas"]
+    huellas_previas = _snapshot["huellas"]
+    hojas, huellas, cambiadas = {}, {}, set()
+    for titulo, valores in descargadas.items():
+        if DETECCION_CAMBIOS != "no":
+            huellas[titulo] = _huella(valores)
+            if titulo in previas and huellas_previas.get(titulo) == huellas[titulo]:
+                hojas[titulo] = previas[titulo]
+                continue
+        hojas[titulo] = parsear_hoja(titulo, valores)
+        cambiadas.add(titulo)
+        notificar_cambios(titulo, diferencias(previas.get(titulo), hojas[titulo]))
+    for titulo in (previas.keys() - hojas.keys()) if completo else ():
+        notificar_cambios(titulo, diferencias(previas[titulo], None))
+    metricas.incrementar("bot_hojas_procesadas_total", len(cambiadas))
+    return hojas, huellas, cambiadas
+
+def obtener_snapshot(forzar=False):
+    """
+    Devuelve {nombre_hoja: Hoja} de todas las hojas no ignoradas.
+    Mientras no pase SNAPSHOT_TTL se sirve de memoria, sin tocar Google.
+    """
+    # Un hilo a la vez: el que espera encuentra el snapshot recién cargado
+    with _lock_snapshot:
+        return _obtener_snapshot(forzar)
+
+def _obtener_snapshot(forzar):
+    ahora = time.time()
+    if not forzar and _snapshot["cargado"] and ahora - _snapshot["cargado"] < SNAPSHOT_TTL:
+        metricas.incrementar("bot_snapshot_total", resultado="cache")
+        return _snapshot["hojas"]
+    return _actualizar_snapshot(ahora)
+
+def revalidar_snapshot():
+    """Compara con Google el snapshot traído del disco (aunque siga dentro del TTL)."""
+    with _lock_snapshot:
+        return _actualizar_snapshot(time.time())
+
+def _actualizar_snapshot(ahora):
+    _snapshot["desde_disco"] = False
+    # Si nadie tocó el Excel desde la última descarga, basta con renovar el TTL
+    revision = _revision_actual()
+    if revision is not None and revision == _snapshot["revision"] and _snapshot["cargado"]:
+        metricas.incrementar("bot_snapshot_total", resultado="sin_cambios")
+        _snapshot["cargado"] = ahora
+        _snapshot["cambiadas"] = set()
+        return _snapshot["hojas"]
+
+    metricas.incrementar("bot_snapshot_total", resultado="descarga")
+    titulos = _titulos_hojas()
+    try:
+        hojas, huellas, cambiadas = _leer_hojas(titulos)
+    except gspread.exceptions.APIError as e:
+        if es_reintentable(e):
+            raise  # ya se reintentó en llamar_api
+        # Lo más probable es que borraron o renombraron una hoja: releemos la lista una vez
+        titulos = _titulos_hojas(forzar=True)
+        hojas, huellas, cambiadas = _leer_hojas(titulos)
+
+    titulos_cambiaron = list(hojas) != list(_snapshot["hojas"])
+    _snapshot["frescas"] = {}
+    _snapshot["hojas"] = hojas
+    _snapshot["huellas"] = huellas
+    _snapshot["cambiadas"] = cambiadas
+    _snapshot["revision"] = revision
+    _snapshot["cargado"] = ahora
+    if cambiadas or titulos_cambiaron:
+        guardar_snapshot_disco()
+    return hojas
+
+# Formato del archivo: zlib(JSON) con solo tipos básicos (str, int, bool, None; las
+# huellas en hex), así no depende de las clases y un archivo adulterado no puede
+# ejecutar nada al cargarse. Si cambia la forma, se sube FORMATO_SNAPSHOT y los
+# archivos viejos se ignoran.
+FORMATO_SNAPSHOT = [2, list(COLUMNAS), list(Capitulo.__slots__)]
+
+def guardar_snapshot_disco():
+    """Guarda el snapshot procesado (llamar con _lock_snapshot tomado; corre en un hilo)."""
+    if not ARCHIVO_SNAPSHOT:
+        return
+    hojas = [
+        (
+            hoja.titulo,
+            hoja.esquema.a_tupla() if hoja.esquema else None,
+            [c.a_tupla() for c in hoja.capitulos],
+        )
+        for hoja in _snapshot["hojas"].values()
+    ]
+    huellas = {titulo: huella.hex() for titulo, huella in _snapshot["huellas"].items()}
+    datos = (FORMATO_SNAPSHOT, _snapshot["revision"], _snapshot["titulos"], huellas, hojas)
+    tmp = f"{ARCHIVO_SNAPSHOT}.tmp"
+    try:
+        with metricas.medir("bot_archivos_segundos", operacion="escribir", archivo=ARCHIVO_SNAPSHOT):
+            with open(tmp, "wb") as f:
+                f.write(zlib.compress(json.dumps(datos, ensure_ascii=False, separators=(",", ":")).encode("utf-8"), 1))
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp, ARCHIVO_SNAPSHOT)
+    except OSError as e:
+        print(f"⚠️ No pude guardar la copia del Excel en disco: {e}")
+
+def cargar_snapshot_disco():
+    """
+    Arranque en caliente: carga la última copia guardada y la marca para revisar
+    en segundo plano. Mientras tanto los comandos responden con ella.
+    """
+    if not ARCHIVO_SNAPSHOT or not os.path.exists(ARCHIVO_SNAPSHOT) or _snapshot["cargado"]:
+        return False
+    try:
+        with open(ARCHIVO_SNAPSHOT, "rb") as f:
+            formato, revision, titulos, huellas, hojas = json.loads(zlib.decompress(f.read()))
+        huellas = {titulo: bytes.fromhex(huella) for titulo, huella in huellas.items()}
+    except (OSError, zlib.error, ValueError, TypeError, AttributeError) as e:
+        print(f"⚠️ Ignoro la copia del Excel en disco: {e!r}")
+        return False
+    if formato != FORMATO_SNAPSHOT:
+        return False
+
+    _snapshot["hojas"] = {
+        titulo: Hoja(
+            titulo,
+            Esquema.desde_tupla(esquema) if esquema is not None else None,
+            [Capitulo.desde_tupla(c) for c in capitulos],
+        )
+        for titulo, esquema, capitulos in hojas
+    }
+    _snapshot["titulos"] = list(titulos)
+    _snapshot["titulos_cargado"] = 0.0  # en la revisión se relee la lista de hojas
+    _snapshot["huellas"] = huellas
+    _snapshot["revision"] = revision
+    _snapshot["cambiadas"] = set(_snapshot["hojas"])
+    _snapshot["cargado"] = time.time()
+    _snapshot["desde_disco"] = True
+    return True
+
+def invalidar_snapshot():
+    """La próxima lectura vuelve a descargar el Excel (las hojas sin cambios no se re-procesan)."""
+    _snapshot["frescas"] = {}
+    _snapshot["cargado"] = 0.0
+    _snapshot["titulos_cargado"] = 0.0
+    _snapshot["revision"] = None
+
+def escribir_celdas(celdas):
+    """Escribe [(hoja, fila, columna, valor)] (1 = primera) en un solo values_batch_update."""
+    cuerpo = {
+        "valueInputOption": "USER_ENTERED",
+        "data": [
+            {"range": absolute_range_name(titulo, rowcol_to_a1(fila, columna)), "values": [[valor]]}
+            for titulo, fila, columna, valor in celdas
+        ],
+    }
+    return llamar_api("values_batch_update", excel().values_batch_update, cuerpo)
+
+def invalidar_hoja(titulo):
+    """Fuerza una descarga nueva en la próxima lectura y que esa hoja se re-procese sí o sí."""
+    _snapshot["huellas"].pop(titulo, None)
+    _snapshot["frescas"].pop(titulo, None)
+    _snapshot["cargado"] = 0.0
+    _snapshot["revision"] = None
+
+def revision_o_renovar():
+    """
+    Con el snapshot vencido: si el Excel no cambió, renueva el TTL y devuelve None.
+    Si cambió (o no se puede saber), devuelve la revisión actual (o "" sin revisión).
+    """
+    with _lock_snapshot:
+        revision = _revision_actual()
+        if revision is not None and revision == _snapshot["revision"] and _snapshot["cargado"]:
+            metricas.incrementar("bot_snapshot_total", resultado="sin_cambios")
+            _snapshot["cargado"] = time.time()
+            _snapshot["cambiadas"] = set()
+            return None
+        return revision or ""
+
+def refrescar_hojas(titulos, revision):
+    """Relee solo esas hojas y las pone en el snapshot, sin dar por renovado el resto."""
+    descargadas = _descargar_valores(titulos)
+    ahora = time.time()
+    # La comparación va con el lock: contra lo último que haya en el snapshot,
+    # aunque otra lectura haya traído estas hojas mientras tanto
+    with _lock_snapshot:
+        hojas, huellas, _ = _procesar_hojas(descargadas, completo=False)
+        todas = dict(_snapshot["hojas"])
+        todas.update(hojas)
+        _snapshot["hojas"] = todas
+        _snapshot["huellas"].update(huellas)
+        for titulo in titulos:
+            _snapshot["frescas"][titulo] = (ahora, revision)
+    return hojas
+
+def snapshot_vigente():
+    return bool(_snapshot["cargado"]) and time.time() - _snapshot["cargado"] < SNAPSHOT_TTL
+
+# =========================
+# ACCESO ASÍNCRONO A SHEETS
+# =========================
+# gspread es bloqueante: todo lo que toca la red corre en este pool para que
+# el bot (heartbeats, otros comandos) siga respondiendo mientras se lee el Excel.
+_ejecutor_sheets = ThreadPoolExecutor(max_workers=SHEETS_HILOS, thread_name_prefix="sheets")
+
+async def en_hilo(func, *args, timeout=SHEETS_TIMEOUT, **kwargs):
+    """Corre una llamada bloqueante en el pool de Sheets con un límite de tiempo."""
+    loop = asyncio.get_running_loop()
+    futuro = loop.run_in_executor(_ejecutor_sheets, functools.partial(func, *args, **kwargs))
+    return await asyncio.wait_for(futuro, timeout)
+
+# Lecturas en curso, por clave. Si llegan varios comandos a la vez (o justo
+# cuando corre el recordatorio) comparten una sola ida a Google.
+_en_vuelo = {}
+
+def _terminar_vuelo(clave, tarea):
+    if _en_vuelo.get(clave) is tarea:
+        del _en_vuelo[clave]
+    if not tarea.cancelled():
+        tarea.exception()  # marcada como vista aunque todos los que esperaban se hayan ido
+
+async def compartido(clave, func, *args):
+    """en_hilo(func, *args), pero una sola llamada en curso por clave."""
+    tarea = _en_vuelo.get(clave)
+    if tarea is None:
+        tarea = asyncio.ensure_future(en_hilo(func, *args))
+        _en_vuelo[clave] = tarea
+        tarea.add_done_callback(functools.partial(_terminar_vuelo, clave))
+    else:
+        metricas.incrementar("bot_sheets_compartidas_total", clave=clave[0])
+    # shield: si un comando se cancela, la lectura sigue para los demás
+    return await asyncio.shield(tarea)
+
+async def obtener_snapshot_async(forzar=False):
+    """Como obtener_snapshot, pero sin bloquear el loop cuando hay que ir a Google."""
+    if not forzar and snapshot_vigente():
+        metricas.incrementar("bot_snapshot_total", resultado="cache")
+        return _snapshot["hojas"]
+    return await compartido(("snapshot", forzar), obtener_snapshot, forzar)
+
+def _hoja_fresca(titulo, revision=None):
+    cuando, rev = _snapshot["frescas"].get(titulo, (0.0, None))
+    if time.time() - cuando < SNAPSHOT_TTL:
+        return True
+    return bool(revision) and rev == revision
+
+_hojas_en_vuelo = {}  # hoja -> tarea del lote que la está releyendo
+
+def _terminar_lote(lote, tarea):
+    for titulo in lote:
+        if _hojas_en_vuelo.get(titulo) is tarea:
+            del _hojas_en_vuelo[titulo]
+    if not tarea.cancelled():
+        tarea.exception()
+
+async def obtener_hojas_async(titulos):
+    """
+    Como obtener_snapshot_async, pero para comandos que solo necesitan algunas
+    hojas: con el snapshot vencido y el Excel cambiado, relee solo esas (sin
+    repetir), en lotes de SHEETS_LOTE y hasta SHEETS_CONCURRENCIA a la vez.
+    """
+    if not _snapshot["cargado"]:
+        return await obtener_snapshot_async()  # sin la lista de hojas todavía: va todo junto
+    titulos = [t for t in dict.fromkeys(titulos) if t in _snapshot["titulos"]]
+    if snapshot_vigente() or all(_hoja_fresca(t) for t in titulos):
+        metricas.incrementar("bot_snapshot_total", resultado="cache")
+        return _snapshot["hojas"]
+
+    revision = await compartido(("revision",), revision_o_renovar)
+    if revision is None:
+        return _snapshot["hojas"]
+    pendientes = [t for t in titulos if not _hoja_fresca(t, revision)]
+    if not pendientes:
+        return _snapshot["hojas"]
+
+    metricas.incrementar("bot_snapshot_total", resultado="parcial")
+    semaforo = asyncio.Semaphore(SHEETS_CONCURRENCIA)
+
+    async def leer(lote):
+        async with semaforo:
+            return await en_hilo(refrescar_hojas, lote, revision)
+
+    # Las hojas que otro comando ya está leyendo se esperan; el resto se pide acá
+    propias = [t for t in pendientes if t not in _hojas_en_vuelo]
+    if len(propias) < len(pendientes):
+        metricas.incrementar("bot_sheets_compartidas_total", len(pendientes) - len(propias), clave="hojas")
+    for i in range(0, len(propias), SHEETS_LOTE):
+        lote = propias[i:i + SHEETS_LOTE]
+        tarea = asyncio.ensure_future(leer(lote))
+        for titulo in lote:
+            _hojas_en_vuelo[titulo] = tarea
+        tarea.add_done_callback(functools.partial(_terminar_lote, lote))
+    tareas = {_hojas_en_vuelo[t] for t in pendientes if t in _hojas_en_vuelo}
+    try:
+        await asyncio.gather(*(asyncio.shield(t) for t in tareas))
+    except gspread.exceptions.APIError as e:
+        if es_reintentable(e):
+            raise
+        # Seguramente renombraron o borraron una hoja: mejor releer todo
+        invalidar_snapshot()
+        return await obtener_snapshot_async()
+    return _snapshot["hojas"]
+
+async def precalentar_excel():
+    """Abre el Excel y lo deja en caché en segundo plano, para que el primer comando no espere."""
+    try:
+        if _snapshot["desde_disco"]:
+            # Los comandos ya responden con la copia del disco; acá solo se pone al día
+            await compartido(("snapshot", False), revalidar_snapshot)
+        else:
+            await obtener_snapshot_async()
+    except Exception as e:
+        # No es grave: se vuelve a intentar con el primer comando que lo necesite
+        print(f"⚠️ No pude precargar el Excel: {e!r}")
+
+# =========================
+# UTILIDADES DE HOJAS / CAPS
+# =========================
+def obtener_hoja(hojas, obra: str):
+    """Devuelve la Hoja de la obra desde el snapshot, o None si no existe o no tiene encabezados."""
+    hoja = hojas.get(obra)
+    if hoja is None or hoja.esquema is None:
+        return None
+    return hoja
+
+def _derivar_cursores(hoja):
+    if "proximo" not in hoja.derivados:
+        hoja.derivados["proximo"], hoja.derivados["listo_temple"] = cursores.de(hoja)
+
+def encontrar_proximo_cap_no_temple(hoja):
+    """Primer cap donde 'subido a temple' != ✅."""
+    _derivar_cursores(hoja)
+    return hoja.derivados["proximo"]
+
+def faltas_asignacion(esquema, capitulo):
+    """
+    Mira columnas 'traductor', 'cleaner', 'typer' para ver qué falta asignar.
+    Devuelve lista como ['Tradu', 'Clean', 'Type'].
+    """
+    faltan = []
+    if esquema.traductor is not None and not capitulo.traductor:
+        faltan.append("Tradu")
+    if esquema.cleaner is not None and not capitulo.cleaner:
+        faltan.append("Clean")
+    if esquema.typer is not None and not capitulo.typer:
+        faltan.append("Type")
+    return faltan
+
+def cap_listo_para_temple(esquema, capitulo):
+    """
+    Devuelve True si RAW, trad, clean y type están listos (✅) pero no subido a temple.
+    """
+    if not esquema.tiene(*ETAPAS):
+        return False
+    return (capitulo.raw and
+            capitulo.trad and
+            capitulo.clean and
+            capitulo.type and
+            not capitulo.temple)
+
+def primer_cap_listo_para_temple(hoja):
+    """Primer cap de la hoja listo para subir a Temple, o None."""
+    _derivar_cursores(hoja)
+    return hoja.derivados["listo_temple"]
+
+# =========================
+# CURSORES POR OBRA
+# =========================
+# En cada hoja los caps ya subidos a Temple son casi todos y no cambian. Por obra
+# se guarda dónde está el primer cap sin Temple ("proximo") y el primero listo
+# para subir ("listo"), como [índice en hoja.capitulos, fila del Excel]; el fin
+# de la hoja es [len(capitulos), última fila + 1]. Con cada cambio avisado solo
+# se avanza desde ahí: se vuelve a recorrer desde el principio si tocaron filas
+# anteriores al cursor (un cap que pierde Temple, filas agregadas o borradas).
+def _listo(capitulo):
+    """cap_listo_para_temple sin mirar el esquema (para los avisos de cambios)."""
+    return (capitulo.raw and capitulo.trad and capitulo.clean and capitulo.type
+            and not capitulo.temple)
+
+def _posicion(capitulos, indice):
+    if indice < len(capitulos):
+        return [indice, capitulos[indice].fila]
+    return [indice, capitulos[-1].fila + 1 if capitulos else 3]
+
+class IndiceCursores:
+    def __init__(self, archivo):
+        self.archivo = archivo
+        self.lock = threading.Lock()
+        self.cursores = None  # obra -> {"proximo", "listo", "esquema", "huella"}
+        self.hojas = {}  # obra -> Hoja sobre la que se calculó (las del disco no están)
+        self.sucias = {}  # obra -> un Capitulo ya cambiado (o None), para reconocer la Hoja nueva
+
+    def _cargar(self):
+        if self.cursores is None:
+            self.cursores = dict(cargar(self.archivo, {}))
+
+    def marcar(self, titulo, cambios):
+        with self.lock:
+            self._cargar()
+            cursor = self.cursores.get(titulo)
+            if cursor is None:
+                return
+            if titulo not in self.hojas:
+                # Cursor del disco que todavía no se comparó con esta hoja
+                del self.cursores[titulo]
+                return
+            proximo, listo = cursor["proximo"], cursor["listo"]
+            muestra = None
+            for antes, despues in cambios:
+                fila = min(c.fila for c in (antes, despues) if c is not None)
+                movido = antes is None or despues is None or antes.fila != despues.fila
+                if fila < proximo[1] and (movido or not despues.temple):
+                    del self.cursores[titulo]  # cambió algo ya recorrido: de nuevo desde el principio
+                    self.sucias.pop(titulo, None)
+                    return
+                if listo is not None and fila < listo[1] and (movido or _listo(despues)):
+                    listo = None  # se vuelve a buscar desde el próximo cap sin Temple
+                muestra = despues or muestra
+            self.cursores[titulo] = dict(cursor, listo=listo, huella=None)
+            self.sucias[titulo] = muestra or self.sucias.get(titulo)
+
+    def _vigente(self, hoja, cursor):
+        """Si el cursor (del disco o de otra Hoja) se puede seguir usando con esta hoja."""
+        obra = hoja.titulo
+        if cursor is None or cursor["esquema"] != list(hoja.esquema.a_tupla()):
+            return False
+        if obra in self.hojas:
+            return True
+        # Traído del disco: tiene que ser del mismo contenido y cuadrar alrededor del cursor
+        huella = _snapshot["huellas"].get(obra)
+        if huella is None or cursor["huella"] != huella.hex() or cursor["listo"] is None:
+            return False
+        capitulos = hoja.capitulos
+        (i, fila), (j, _) = cursor["proximo"], cursor["listo"]
+        if not i <= j <= len(capitulos) or _posicion(capitulos, i)[1] != fila:
+            return False
+        return ((i == len(capitulos) or not capitulos[i].temple)
+                and (i == 0 or capitulos[i - 1].temple)
+                and (j == len(capitulos) or cap_listo_para_temple(hoja.esquema, capitulos[j])))
+
+    def _recorrer(self, hoja, i=0, j=None):
+        capitulos = hoja.capitulos
+        while i < len(capitulos) and capitulos[i].temple:
+            i += 1
+        if not hoja.esquema.tiene(*ETAPAS):
+            return i, len(capitulos)
+        j = i if j is None else max(i, j)
+        while j < len(capitulos) and not cap_listo_para_temple(hoja.esquema, capitulos[j]):
+            j += 1
+        return i, j
+
+    def de(self, hoja):
+        """(primer cap sin Temple, primer cap listo para Temple) de la hoja; None si no hay."""
+        if not hoja.esquema.tiene("temple"):
+            return None, None
+        obra = hoja.titulo
+        capitulos = hoja.capitulos
+        with self.lock:
+            self._cargar()
+            muestra = self.sucias.get(obra)
+            if (_snapshot["hojas"].get(obra) is not hoja
+                    or (muestra is not None and hoja.por_cap.get(muestra.cap) is not muestra)
+                    or len(hoja.por_cap) != len(capitulos)):
+                # Hoja vieja, todavía sin publicar o con caps repetidos (los avisos
+                # de cambios no los distinguen): se recorre sin tocar el índice
+                i, j = self._recorrer(hoja)
+            else:
+                cursor = self.cursores.get(obra)
+                if not self._vigente(hoja, cursor):
+                    metricas.incrementar("bot_cursores_total", resultado="recorrido")
+                    i, j = self._recorrer(hoja)
+                elif obra not in self.sucias and self.hojas.get(obra) is hoja:
+                    metricas.incrementar("bot_cursores_total", resultado="cache")
+                    i, j = cursor["proximo"][0], cursor["listo"][0]
+                else:
+                    metricas.incrementar("bot_cursores_total", resultado="avance")
+                    listo = cursor["listo"]
+                    i, j = self._recorrer(hoja, cursor["proximo"][0], listo[0] if listo else None)
+                self._guardar(hoja, i, j)
+        return (capitulos[i] if i < len(capitulos) else None,
+                capitulos[j] if j < len(capitulos) else None)
+
+    def _guardar(self, hoja, i, j):
+        obra = hoja.titulo
+        huella = _snapshot["huellas"].get(obra)
+        cursor = {
+            "proximo": _posicion(hoja.capitulos, i),
+            "listo": _posicion(hoja.capitulos, j),
+            "esquema": list(hoja.esquema.a_tupla()),
+            # Las hojas parcheadas no tienen huella: tras reiniciar se recorren de nuevo
+            "huella": huella.hex() if huella is not None else None,
+        }
+        self.hojas[obra] = hoja
+        self.sucias.pop(obra, None)
+        if self.cursores.get(obra) != cursor:
+            self.cursores[obra] = cursor
+            hojas = _snapshot["hojas"]
+            guardar(self.archivo, {o: c for o, c in self.cursores.items() if o in hojas})
+
+cursores = IndiceCursores(ARCHIVO_CURSORES)
+_observadores_hojas.append(cursores.marcar)
+
+# =========================
+# HISTORIAL DE ETAPAS
+# =========================
+# Cada vez que una etapa de un cap se marca o desmarca queda una línea en
+# ARCHIVO_HISTORIAL ("ts obra cap etapa 1|0", separado por tabs), que nunca se
+# reescribe. Los agregados (caps por día y tiempos entre etapas, ya ordenados)
+# se actualizan con cada línea; al arrancar se parte del último resumen guardado
+# y solo se lee lo que se agregó al log después. El resumen se guarda cada tantas
+# líneas o minutos, no solo al salir: un SIGTERM no pasa por atexit. Un cap cuenta como terminado en
+# una etapa la primera vez que se marca (desmarcar y volver a marcar no suma), y
+# las etapas marcadas en la misma tanda (mismo ts) no dan tiempos entre ellas.
+SEGUNDOS_DIA = 86400
+FORMATO_HISTORIAL = 2  # si cambian las reglas de arriba, el resumen viejo no sirve
+RESUMEN_CADA_LINEAS = 500
+RESUMEN_CADA_SEGUNDOS = 600
+
+def _mediana(ordenados):
+    if not ordenados:
+        return None
+    medio = len(ordenados) // 2
+    if len(ordenados) % 2:
+        return ordenados[medio]
+    return (ordenados[medio - 1] + ordenados[medio]) / 2
+
+class Historial:
+    def __init__(self, archivo, archivo_resumen):
+        self.archivo = archivo
+        self.archivo_resumen = archivo_resumen
+        self.lock = threading.RLock()
+        self.cargado = False
+        self.posicion = 0  # bytes del log ya incluidos en los agregados
+        self.sin_resumen = 0  # líneas aplicadas desde el último resumen guardado
+        self.ultimo_resumen = time.monotonic()
+        self.por_dia = {}  # (obra | None, etapa) -> {día: caps}
+        self.marcas = {}  # (obra, cap) -> {etapa: ts de la primera vez que quedó ✅}
+        self.duraciones = {}  # (obra | None, etapa | "ciclo") -> segundos, ordenados
+
+    def _aplicar(self, ts, obra, cap, etapa, listo):
+        marcas = self.marcas.setdefault((obra, cap), {})
+        if not listo or etapa in marcas:
+            return
+        marcas[etapa] = ts
+        dia = ts // SEGUNDOS_DIA
+        for clave in ((obra, etapa), (None, etapa)):
+            dias = self.por_dia.setdefault(clave, {})
+            dias[dia] = dias.get(dia, 0) + 1
+
+        # Tiempo desde la etapa anterior y, al llegar a Temple, desde el RAW
+        i = ETAPAS.index(etapa)
+        muestras = []
+        if i and ETAPAS[i - 1] in marcas:
+            muestras.append((etapa, ts - marcas[ETAPAS[i - 1]]))
+        if etapa == "temple" and "raw" in marcas:
+            muestras.append(("ciclo", ts - marcas["raw"]))
+        for nombre, segundos in muestras:
+            if segundos <= 0:
+                continue  # misma tanda (un !marcar de varias etapas): no es un tiempo real
+            for clave in ((obra, nombre), (None, nombre)):
+                bisect.insort(self.duraciones.setdefault(clave, []), segundos)
+
+    def _leer_log(self):
+        if not os.path.exists(self.archivo):
+            return
+        with open(self.archivo, "rb") as f:
+            f.seek(self.posicion)
+            for linea in f:
+                if not linea.endswith(b"\n"):
+                    break  # línea a medio escribir: se retoma la próxima vez
+                self.posicion += len(linea)
+                self.sin_resumen += 1
+                try:
+                    ts, obra, cap, etapa, listo = linea.decode("utf-8").rstrip("\n").split("\t")
+                    self._aplicar(int(ts), obra, cap, etapa, listo == "1")
+                except ValueError:
+                    continue
+
+    def cargar(self):
+        with self.lock:
+            if self.cargado:
+                return
+            try:
+                with open(self.archivo_resumen, "rb") as f:
+                    formato, posicion, por_dia, marcas, duraciones = json.loads(zlib.decompress(f.read()))
+                if formato == FORMATO_HISTORIAL and posicion <= os.path.getsize(self.archivo):
+                    # JSON no tiene claves tupla ni enteras: van como listas [clave..., valor]
+                    self.por_dia = {(obra, etapa): {int(dia): n for dia, n in dias} for obra, etapa, dias in por_dia}
+                    self.marcas = {(obra, cap): etapas for obra, cap, etapas in marcas}
+                    self.duraciones = {(obra, nombre): lista for obra, nombre, lista in duraciones}
+                    self.posicion = posicion
+            except (OSError, zlib.error, ValueError, TypeError, AttributeError):
+                # sin resumen (o no sirve): se lee el log completo
+                self.por_dia, self.marcas, self.duraciones = {}, {}, {}
+            self._leer_log()
+            self.cargado = True
+
+    def guardar_resumen(self):
+        with self.lock:
+            if not self.cargado:
+                return
+            datos = (
+                FORMATO_HISTORIAL,
+                self.posicion,
+                [(obra, etapa, list(dias.items())) for (obra, etapa), dias in self.por_dia.items()],
+                [(obra, cap, etapas) for (obra, cap), etapas in self.marcas.items()],
+                [(obra, nombre, lista) for (obra, nombre), lista in self.duraciones.items()],
+            )
+            texto = zlib.compress(json.dumps(datos, ensure_ascii=False, separators=(",", ":")).encode("utf-8"), 1)
+            self.sin_resumen = 0
+            self.ultimo_resumen = time.monotonic()
+        tmp = f"{self.archivo_resumen}.tmp"
+        try:
+            with open(tmp, "wb") as f:
+                f.write(texto)
+            os.replace(tmp, self.archivo_resumen)
+        except OSError as e:
+            print(f"⚠️ No pude guardar el resumen del historial: {e}")
+
+    def registrar(self, eventos):
+        """eventos: [(obra, cap, etapa, listo)] que acaban de pasar."""
+        if not eventos:
+            return
+        ts = int(time.time())
+        lineas = "".join(
+            f"{ts}\t{obra}\t{cap}\t{etapa}\t{int(listo)}\n"
+            for obra, cap, etapa, listo in eventos
+        )
+        with self.lock:
+            self.cargar()
+            try:
+                with open(self.archivo, "ab") as f:
+                    f.write(lineas.encode("utf-8"))
+            except OSError as e:
+                print(f"⚠️ No pude escribir el historial: {e}")
+                return
+            self._leer_log()
+            if (self.sin_resumen >= RESUMEN_CADA_LINEAS
+                    or time.monotonic() - self.ultimo_resumen >= RESUMEN_CADA_SEGUNDOS):
+                self.guardar_resumen()
+
+    def completados(self, obra, etapa, dias, hoy=None):
+        """Caps que llegaron a esa etapa en los últimos `dias` días (obra None = todas)."""
+        with self.lock:
+            self.cargar()
+            hoy = (int(time.time()) if hoy is None else hoy) // SEGUNDOS_DIA
+            por_dia = self.por_dia.get((obra, etapa), {})
+            return sum(por_dia.get(hoy - i, 0) for i in range(dias))
+
+    def mediana(self, obra, etapa):
+        """Mediana en segundos del tiempo hasta esa etapa desde la anterior ("ciclo" = RAW → Temple)."""
+        with self.lock:
+            self.cargar()
+            return _mediana(self.duraciones.get((obra, etapa), ()))
+
+    def obras(self):
+        with self.lock:
+            self.cargar()
+            return sorted({obra for obra, _ in self.por_dia if obra is not None})
+
+historial = Historial(ARCHIVO_HISTORIAL, ARCHIVO_HISTORIAL_RESUMEN)
+
+def _limpiar_campo(texto):
+    return str(texto).replace("\t", " ").replace("\n", " ")
+
+def _registrar_en_historial(titulo, cambios):
+    eventos = []
+    for antes, despues in cambios:
+        if antes is None or despues is None:
+            continue  # hoja o cap que recién aparece: no es un cambio de etapa
+        for etapa in ETAPAS:
+            listo = getattr(despues, etapa)
+            if getattr(antes, etapa) != listo:
+                eventos.append((_limpiar_campo(titulo), _limpiar_campo(despues.cap), etapa, listo))
+    historial.registrar(eventos)
+
+_observadores_hojas.append(_registrar_en_historial)
+
+# =========================
+# CARGA POR PERSONA (ÍNDICE INVERTIDO)
+# =========================
+# persona -> etapas abiertas que tiene asignadas en todas las hojas. Se rehace
+# solo la parte de las hojas que cambiaron: las que el snapshot reemplazó por
+# otra Hoja y las que avisaron un parche (webhook / !marcar).
+ROL_ETAPA = {"traductor": ("trad", "Tradu"), "cleaner": ("clean", "Clean"), "typer": ("type", "Type")}
+SEPARADORES_PERSONAS = ("/", ",", "&", "+")
+
+def separar_personas(texto):
+    for sep in SEPARADORES_PERSONAS:
+        texto = texto.replace(sep, "\n")
+    return [p.strip() for p in texto.split("\n") if p.strip()]
+
+class IndiceCargas:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.por_persona = {}  # persona normalizada -> {(obra, cap, etapa)}
+        self.nombres = {}  # persona normalizada -> como está escrita en el Excel
+        self.por_hoja = {}  # obra -> [(persona, item)] para poder sacarlos
+        self.indexadas = {}  # obra -> Hoja indexada
+        self.sucias = set()
+
+    def marcar_sucia(self, titulo, cambios=None):
+        with self.lock:
+            self.sucias.add(titulo)
+
+    def _sacar(self, obra):
+        for persona, item in self.por_hoja.pop(obra, ()):
+            items = self.por_persona.get(persona)
+            if items is not None:
+                items.discard(item)
+                if not items:
+                    del self.por_persona[persona]
+                    del self.nombres[persona]
+        self.indexadas.pop(obra, None)
+
+    def _indexar(self, obra, hoja):
+        self._sacar(obra)
+        self.indexadas[obra] = hoja
+        if hoja.esquema is None:
+            return
+        entradas = self.por_hoja[obra] = []
+        for c in hoja.capitulos:
+            if c.temple:
+                continue
+            for rol, (etapa, _) in ROL_ETAPA.items():
+                if getattr(c, etapa):
+                    continue
+                for nombre in separar_personas(getattr(c, rol)):
+                    persona = normalizar_nombre(nombre)
+                    item = (obra, c.cap, etapa)
+                    self.por_persona.setdefault(persona, set()).add(item)
+                    self.nombres.setdefault(persona, nombre)
+                    entradas.append((persona, item))
+
+    def actualizar(self, hojas):
+        """Pone el índice al día con el snapshot: solo re-indexa las hojas que cambiaron."""
+        with self.lock:
+            sucias, self.sucias = self.sucias, set()
+            for obra in list(self.indexadas):
+                if obra not in hojas:
+                    self._sacar(obra)
+            for obra, hoja in hojas.items():
+                if obra in sucias or self.indexadas.get(obra) is not hoja:
+                    self._indexar(obra, hoja)
+
+    def de(self, persona):
+        """(nombre, [(obra, cap, etapa)]) de una persona, o (persona, []) si no tiene nada."""
+        with self.lock:
+            clave = normalizar_nombre(persona)
+            return self.nombres.get(clave, persona), sorted(self.por_persona.get(clave, ()))
+
+    def resumen(self):
+        """[(nombre, items)] de todas las personas con algo abierto."""
+        with self.lock:
+            return [(self.nombres[p], sorted(items)) for p, items in self.por_persona.items()]
+
+indice_cargas = IndiceCargas()
+_observadores_hojas.append(indice_cargas.marcar_sucia)
+
+# =========================
+# REPORTES (UNA SOLA PASADA)
+# =========================
+# Cada reporte es una etapa: ve cada hoja una vez (visitar) y al final arma su
+# mensaje. ejecutar_reportes recorre el snapshot una sola vez para todos, así
+# agregar un reporte nuevo no agrega lecturas ni recorridos.
+class Reporte:
+    def visitar(self, obra, hoja):
+        pass
+
+    def mensaje(self):
+        """Texto del reporte, o None si no hay nada que avisar."""
+        return None
+
+def _ordenar_como(items, obras):
+    """Ordena tuplas (obra, ...) según el orden de la lista obras."""
+    orden = {obra: i for i, obra in enumerate(obras)}
+    return sorted(items, key=lambda item: orden[item[0]])
+
+class ReporteRaw(Reporte):
+    """Obras cuyo siguiente cap (el primero sin Temple) todavía no tiene RAW."""
+    def __init__(self, excluidas, obras=None, titulo="⭑ RAW PENDIENTES ⭑",
+                 vacio="✅ No hay RAW pendientes para el siguiente Cap de cada obra."):
+        self.excluidas = excluidas
+        self.obras = obras  # None = todas las hojas
+        self.titulo = titulo
+        self.vacio = vacio
+        self.avisos = []
+
+    def visitar(self, obra, hoja):
+        if obra in self.excluidas or (self.obras is not None and obra not in self.obras):
+            return
+        if not hoja.esquema.tiene("raw", "temple"):
+            return
+        capitulo = encontrar_proximo_cap_no_temple(hoja)
+        if capitulo and not capitulo.raw:
+            self.avisos.append((obra, capitulo.cap))
+
+    def resultado(self):
+        if self.obras is None:
+            return self.avisos
+        return _ordenar_como(self.avisos, self.obras)
+
+    def mensaje(self):
+        avisos = self.resultado()
+        if not avisos:
+            return f"{self.titulo}\n\n{self.vacio}" if self.vacio else None
+        lineas = [f"• {obra} → Cap {cap}" for obra, cap in avisos]
+        return f"{self.titulo}\n\n" + "\n".join(lineas)
+
+class ReporteAsignar(Reporte):
+    """Siguiente cap de ciertas obras al que le falta traductor, cleaner o typer."""
+    def __init__(self, excluidas, obras, titulo="⭑ CAPS POR ASIGNAR (para dentro de 7 días) ⭑"):
+        self.excluidas = excluidas
+        self.obras = obras
+        self.titulo = titulo
+        self.faltas = []
+
+    def visitar(self, obra, hoja):
+        if obra in self.excluidas or obra not in self.obras:
+            return
+        capitulo = encontrar_proximo_cap_no_temple(hoja)
+        if not capitulo:
+            return
+        faltan = faltas_asignacion(hoja.esquema, capitulo)
+        if faltan:
+            self.faltas.append((obra, capitulo.cap, faltan))
+
+    def resultado(self):
+        return _ordenar_como(self.faltas, self.obras)
+
+    def mensaje(self):
+        faltas = self.resultado()
+        if not faltas:
+            return None
+        lineas = [f"• {obra} → Cap {cap} | {', '.join(faltan)}" for obra, cap, faltan in faltas]
+        return f"{self.titulo}\n\n" + "\n".join(lineas)
+
+class ReporteTemple(Reporte):
+    """El primer cap (en orden de hojas) listo para subir a Temple."""
+    def __init__(self):
+        self.candidato = None
+
+    def visitar(self, obra, hoja):
+        if self.candidato:
+            return
+        capitulo = primer_cap_listo_para_temple(hoja)
+        if capitulo:
+            self.candidato = (obra, capitulo.cap)
+
+    def mensaje(self):
+        if not self.candidato:
+            return None
+        obra, cap = self.candidato
+        return f"⭑ LISTO PARA SUBIR A LA WEB ⭑\n\n• {obra} → Cap {cap}"
+
+class ReporteResumen(Reporte):
+    """Resumen semanal: RAW pendientes (del reporte de RAW) y avance de la semana (del historial)."""
+    def __init__(self, reporte_raw):
+        self.reporte_raw = reporte_raw
+
+    def mensaje(self):
+        msg = f"⭑ RESUMEN SEMANAL ⭑\n\nRAW pendientes actuales: {len(self.reporte_raw.avisos)}"
+        subidos = historial.completados(None, "temple", 7)
+        msg += f"\nCaps subidos a Temple esta semana: {subidos}"
+        ciclo = historial.mediana(None, "ciclo")
+        if ciclo is not None:
+            msg += f"\nTiempo típico de RAW a Temple: {formatear_duracion(ciclo)}"
+        return msg
+
+def obras_excluidas():
+    """Obras sin recordatorios de RAW / asignación (hiatus + solo)."""
+    return set(cargar(ARCHIVO_HIATUS, [])) | set(cargar(ARCHIVO_SOLO, []))
+
+def ejecutar_reportes(hojas, reportes):
+    """Recorre el snapshot una vez y devuelve los mensajes de los reportes que tengan algo."""
+    for obra, hoja in hojas.items():
+        if hoja.esquema is None:
+            continue
+        for reporte in reportes:
+            reporte.visitar(obra, hoja)
+    return [m for m in (r.mensaje() for r in reportes) if m]
+
+def detectar_raw(hojas):
+    reporte = ReporteRaw(obras_excluidas())
+    ejecutar_reportes(hojas, [reporte])
+    return reporte.avisos
+
+# =========================
+# READY
+# =========================
+@bot.event
+async def on_ready():
+    print("✅ Bot activo 24/7 (horario Perú)")
+    _webhook["loop"] = asyncio.get_running_loop()
+    iniciar_watchdog()
+    programar_aviso_plazos()
+    if not _snapshot["cargado"] or _snapshot["desde_disco"]:
+        _conexion["precarga"] = asyncio.create_task(precalentar_excel())
+    if not chequeo_automatico.is_running():
+        chequeo_automatico.start()
+    await recuperar_recordatorio()
+
+@bot.before_invoke
+async def inicio_comando(ctx):
+    ctx.inicio_metricas = time.perf_counter()
+
+@bot.after_invoke
+async def fin_comando(ctx):
+    nombre = ctx.command.qualified_name
+    resultado = "error" if ctx.command_failed else "ok"
+    metricas.incrementar("bot_comandos_total", comando=nombre, resultado=resultado)
+    metricas.observar("bot_comando_segundos", time.perf_counter() - ctx.inicio_metricas, comando=nombre)
+
+@bot.event
+async def on_command_error(ctx, error):
+    original = getattr(error, "original", error)
+    if isinstance(original, asyncio.TimeoutError):
+        await responder(ctx, "⌛ Google tardó demasiado en responder. Intenta de nuevo en un rato.")
+        return
+    if es_reintentable(original):
+        await responder(ctx, "⏳ Google está limitando las lecturas del Excel. Intenta de nuevo en un minuto.")
+        return
+    print(f"Error en el comando {ctx.command}:")
+    traceback.print_exception(type(error), error, error.__traceback__)
+
+# =========================
+# COMANDOS BÁSICOS
+# =========================
+@bot.command()
+async def ping(ctx):
+    await responder(ctx, "pong 🏓")
+
+@bot.command()
+async def refrescar(ctx):
+    invalidar_snapshot()
+    await responder(ctx, "🔄 Listo, la próxima consulta vuelve a leer el Excel.")
+
+@bot.command()
+async def raw_pendientes(ctx):
+    reporte = ReporteRaw(obras_excluidas())
+    ejecutar_reportes(await obtener_snapshot_async(), [reporte])
+    await responder(ctx, reporte.mensaje())
+
+# =========================
+# VER ESTADO
+# =========================
+@bot.command()
+async def ver_estado(ctx, obra, cap):
+    obra = resolver_obra(obra, difuso=True)
+    if not obra_conocida(obra):
+        await responder(ctx, mensaje_obra_no_encontrada(obra))
+        return
+    hojas = await obtener_snapshot_async()
+    hoja = obtener_hoja(hojas, obra)
+    if hoja is None:
+        await responder(ctx, "❌ No pude leer esa obra en el Excel." if obra in hojas else mensaje_obra_no_encontrada(obra))
+        return
+
+    if not hoja.esquema.tiene(*ETAPAS):
+        await responder(ctx, "❌ Faltan columnas esperadas en esa hoja (RAW / listo / Temple).")
+        return
+
+    capitulo = hoja.por_cap.get(cap)
+    if not capitulo:
+        await responder(ctx, "❌ Capítulo no encontrado.")
+        return
+
+    def estado(listo):
+        return "✅ listo" if listo else "⏳ pendiente"
+
+    msg = f"⭑ ESTADO {obra} Cap {cap} ⭑\n\n"
+    msg += f"{estado(capitulo.raw)} RAW\n"
+    msg += f"{estado(capitulo.trad)} Traducción\n"
+    msg += f"{estado(capitulo.clean)} Clean\n"
+    msg += f"{estado(capitulo.type)} Type\n"
+    msg += f"{estado(capitulo.temple)} Subido a Temple\n"
+
+    await responder(ctx, msg)
+
+# =========================
+# MARCAR ETAPAS (ESCRIBE EN EL EXCEL)
+# =========================
+MAX_CAPS_MARCAR = 100
+
+class DemasiadosCaps(ValueError):
+    """Los caps se entienden, pero son más de MAX_CAPS_MARCAR."""
+
+def parsear_caps(texto):
+    """
+    '12-15' / '12' / '12,14,20-22' -> ['12', '13', ...]. ValueError si no se
+    entiende, DemasiadosCaps si pasa de MAX_CAPS_MARCAR.
+    """
+    caps = []
+    for parte in texto.split(","):
+        parte = parte.strip()
+        if "-" in parte:
+            desde, hasta = (int(x) for x in parte.split("-", 1))
+            if hasta < desde:
+                raise ValueError(parte)
+            if len(caps) + hasta - desde >= MAX_CAPS_MARCAR:
+                raise DemasiadosCaps(parte)  # antes de armar un rango enorme
+            caps.extend(str(n) for n in range(desde, hasta + 1))
+        elif parte:
+            caps.append(parte)
+    if not caps:
+        raise ValueError(texto)
+    if len(caps) > MAX_CAPS_MARCAR:
+        raise DemasiadosCaps(texto)
+    return caps
+
+async def cambiar_etapas(ctx, obra, caps, etapas, listo):
+    """Pone (o quita) ✅ en las etapas de varios caps con una sola escritura al Excel."""
+    # Sin búsqueda difusa: escribir en la obra equivocada es peor que pedir el nombre
+    obra = resolver_obra(obra)
+    etapas = [e.lower() for e in etapas]
+    invalidas = [e for e in etapas if e not in ETAPAS]
+    if not etapas or invalidas:
+        await responder(ctx, f"❌ Etapas válidas: {', '.join(ETAPAS)}. Ejemplo: !marcar obra 12-15 clean type")
+        return
+    try:
+        lista_caps = parsear_caps(caps)
+    except DemasiadosCaps:
+        await responder(ctx, f"❌ Se pueden marcar hasta {MAX_CAPS_MARCAR} caps a la vez.")
+        return
+    except ValueError:
+        await responder(ctx, f"❌ No entendí los caps. Ejemplos: 12 / 12-15 / 12,14,20-22 (hasta {MAX_CAPS_MARCAR}).")
+        return
+
+    if not obra_conocida(obra):
+        await responder(ctx, mensaje_obra_no_encontrada(obra))
+        return
+    hojas = await obtener_snapshot_async()
+    hoja = obtener_hoja(hojas, obra)
+    if hoja is None:
+        await responder(ctx, "❌ No pude leer esa obra en el Excel." if obra in hojas else mensaje_obra_no_encontrada(obra))
+        return
+    if not hoja.esquema.tiene(*etapas):
+        await responder(ctx, "❌ Faltan columnas esperadas en esa hoja (RAW / listo / Temple).")
+        return
+
+    no_encontrados = [cap for cap in lista_caps if cap not in hoja.por_cap]
+    celdas, cambios = [], []
+    valor = "✅" if listo else ""
+    for cap in lista_caps:
+        capitulo = hoja.por_cap.get(cap)
+        if capitulo is None:
+            continue
+        for etapa in etapas:
+            if getattr(capitulo, etapa) != listo:
+                celdas.append((hoja.titulo, capitulo.fila, getattr(hoja.esquema, etapa) + 1, valor))
+                cambios.append((capitulo, etapa))
+
+    if celdas:
+        try:
+            await en_hilo(escribir_celdas, celdas)
+        except gspread.exceptions.APIError as e:
+            if es_reintentable(e):
+                raise
+            await responder(ctx, f"❌ Google no dejó escribir en el Excel: {e}")
+            return
+        # Lo escrito ya vale en la caché: !ver_estado no necesita releer
+        previos = {}
+        for capitulo, etapa in cambios:
+            previos.setdefault(capitulo.cap, (Capitulo.desde_tupla(capitulo.a_tupla()), capitulo))
+            setattr(capitulo, etapa, listo)
+        hoja.derivados.clear()
+        _snapshot["huellas"].pop(hoja.titulo, None)  # ya no es lo que se descargó
+        notificar_cambios(hoja.titulo, list(previos.values()))
+
+    if celdas:
+        accion = "Marcado" if listo else "Desmarcado"
+        msg = f"✅ {accion} {', '.join(etapas)} en {obra}: {len(celdas)} celda(s) cambiada(s)."
+    else:
+        msg = "✅ Ya estaba así, no hubo que cambiar nada en el Excel."
+    if no_encontrados:
+        msg += f"\n⚠️ Caps no encontrados: {', '.join(no_encontrados)}"
+    await responder(ctx, msg)
+
+@bot.command()
+async def marcar(ctx, obra, caps, *etapas):
+    """
+    !marcar obra 12-15 clean type
+    """
+    await cambiar_etapas(ctx, obra, caps, etapas, True)
+
+@bot.command()
+async def desmarcar(ctx, obra, caps, *etapas):
+    """
+    !desmarcar obra 12 temple
+    """
+    await cambiar_etapas(ctx, obra, caps, etapas, False)
+
+# =========================
+# HIATUS
+# =========================
+@bot.command()
+async def hiatus(ctx, *, obra):
+    obra = resolver_obra(obra)
+    data = cargar(ARCHIVO_HIATUS, [])
+    if obra not in data:
+        data.append(obra)
+        guardar(ARCHIVO_HIATUS, data)
+        await responder(ctx, f"🔕 {obra} en hiatus")
+    else:
+        await responder(ctx, f"ℹ️ {obra} ya estaba en hiatus")
+
+@bot.command()
+async def reactivar(ctx, *, obra):
+    obra = resolver_obra(obra)
+    data = cargar(ARCHIVO_HIATUS, [])
+    if obra in data:
+        data.remove(obra)
+        guardar(ARCHIVO_HIATUS, data)
+        await responder(ctx, f"🔔 {obra} reactivada")
+    else:
+        await responder(ctx, f"ℹ️ {obra} no estaba en hiatus")
+
+@bot.command()
+async def ver_hiatus(ctx):
+    data = cargar(ARCHIVO_HIATUS, [])
+    if not data:
+        await responder(ctx, "✅ No hay obras en hiatus.")
+    else:
+        msg = "🔕 OBRAS EN HIATUS:\n" + "\n".join(f"- {o}" for o in data)
+        await responder(ctx, msg)
+
+# =========================
+# SOLO
+# =========================
+@bot.command()
+async def solo(ctx, *, obra):
+    obra = resolver_obra(obra)
+    data = cargar(ARCHIVO_SOLO, [])
+    if obra not in data:
+        data.append(obra)
+        guardar(ARCHIVO_SOLO, data)
+        await responder(ctx, f"🧍 {obra} en modo SOLO")
+    else:
+        await responder(ctx, f"ℹ️ {obra} ya estaba en modo SOLO")
+
+@bot.command()
+async def reactivar_solo(ctx, *, obra):
+    obra = resolver_obra(obra)
+    data = cargar(ARCHIVO_SOLO, [])
+    if obra in data:
+        data.remove(obra)
+        guardar(ARCHIVO_SOLO, data)
+        await responder(ctx, f"🔔 {obra} salió de SOLO")
+    else:
+        await responder(ctx, f"ℹ️ {obra} no estaba en SOLO")
+
+@bot.command()
+async def ver_solo(ctx):
+    data = cargar(ARCHIVO_SOLO, [])
+    if not data:
+        await responder(ctx, "✅ No hay obras en modo SOLO.")
+    else:
+        msg = "🧍 OBRAS SOLO:\n" + "\n".join(f"- {o}" for o in data)
+        await responder(ctx, msg)
+
+# =========================
+# CALENDARIO (DÍAS DE SUBIDA)
+# =========================
+def formatear_calendario_item(datos):
+    tipo = datos.get("tipo")
+    valor = datos.get("valor")
+
+    if tipo == "semana":
+        return str(valor)
+    if tipo == "semana_multiple":
+        return ", ".join(valor)
+    if tipo == "mes":
+        return ", ".join(str(x) for x in valor)
+    return str(datos)
+
+# Índice (día de semana, día del mes) -> obras. Son solo 7 x 31 combinaciones,
+# así que se precalculan todas y cada consulta por fecha es una búsqueda directa.
+# Se recompila únicamente cuando cambia el calendario.
+_indice_calendario = {"version": None, "indice": {}}
+
+def indice_calendario():
+    version = version_estado(ARCHIVO_CALENDARIO)
+    if _indice_calendario["version"] != version:
+        _indice_calendario["indice"] = compilar_calendario(cargar(ARCHIVO_CALENDARIO, {}))
+        _indice_calendario["version"] = version
+    return _indice_calendario["indice"]
+
+def compilar_calendario(cal):
+    indice = {(sem, dia): [] for sem in range(7) for dia in range(1, 32)}
+    for obra, datos in cal.items():
+        tipo = datos.get("tipo")
+        valor = datos.get("valor")
+
+        semanas, dias_mes = set(), set()
+        if tipo == "semana" and valor in DIAS_VALIDOS:
+            semanas.add(DIAS_VALIDOS.index(valor))
+        elif tipo == "semana_multiple":
+            semanas.update(DIAS_VALIDOS.index(d) for d in valor if d in DIAS_VALIDOS)
+        elif tipo == "mes":
+            dias_mes.update(valor)
+
+        for (sem, dia), obras in indice.items():
+            if sem in semanas or dia in dias_mes:
+                obras.append(obra)
+    return indice
+
+@bot.command()
+async def agregar_obra(ctx, obra, *, valor):
+    """
+    !agregar_obra yang-ilwoo-y-yo miércoles
+    !agregar_obra director lunes, jueves
+    !agregar_obra director 4,14,24
+    """
+    obra = resolver_obra(obra)
+    cal = cargar(ARCHIVO_CALENDARIO, {})
+    valor = valor.lower().replace(" ", "")
+
+    # Días del mes
+    if all(ch.isdigit() or ch == "," for ch in valor):
+        dias = [int(x) for x in valor.split(",") if x]
+        cal[obra] = {"tipo": "mes", "valor": dias}
+        guardar(ARCHIVO_CALENDARIO, cal)
+        bonito = formatear_calendario_item(cal[obra])
+        await responder(ctx, f"📆 {obra} → {bonito}")
+        return
+
+    # Varios días de semana
+    if "," in valor:
+        dias = valor.split(",")
+        for d in dias:
+            if d not in DIAS_VALIDOS:
+                await responder(ctx, "❌ Día inválido. Usa: lunes, martes, miércoles...")
+                return
+        cal[obra] = {"tipo": "semana_multiple", "valor": dias}
+        guardar(ARCHIVO_CALENDARIO, cal)
+        bonito = formatear_calendario_item(cal[obra])
+        await responder(ctx, f"📅 {obra} → {bonito}")
+        return
+
+    # Un solo día
+    if valor in DIAS_VALIDOS:
+        cal[obra] = {"tipo": "semana", "valor": valor}
+        guardar(ARCHIVO_CALENDARIO, cal)
+        bonito = formatear_calendario_item(cal[obra])
+        await responder(ctx, f"📅 {obra} → {bonito}")
+        return
+
+    await responder(ctx, "❌ Formato inválido. Ejemplo: lunes / lunes,viernes / 4,14,24")
+
+@bot.command()
+async def cambiar_dia(ctx, obra, *, nuevo_valor):
+    obra = resolver_obra(obra)
+    cal = cargar(ARCHIVO_CALENDARIO, {})
+    if obra not in cal:
+        await responder(ctx, "❌ Esa obra no está en el calendario.")
+        return
+    ctx.message.content = f"!agregar_obra {obra} {nuevo_valor}"
+    await agregar_obra(ctx, obra, valor=nuevo_valor)
+
+@bot.command()
+async def eliminar_obra(ctx, *, obra):
+    obra_real = resolver_obra(obra)
+    cal = cargar(ARCHIVO_CALENDARIO, {})
+    if obra_real in cal:
+        del cal[obra_real]
+        guardar(ARCHIVO_CALENDARIO, cal)
+        await responder(ctx, f"🗑️ {obra_real} eliminada del calendario")
+    else:
+        await responder(ctx, "❌ Esa obra no está en el calendario.")
+
+@bot.command()
+async def calendario(ctx):
+    cal = cargar(ARCHIVO_CALENDARIO, {})
+    if not cal:
+        await responder(ctx, "📅 El calendario está vacío.")
+        return
+    msg = "📅 CALENDARIO:\n"
+    for obra, datos in cal.items():
+        bonito = formatear_calendario_item(datos)
+        msg += f"- {obra} → {bonito}\n"
+    await responder(ctx, msg)
+
+def formatear_subidas(dias):
+    lineas = []
+    for fecha, obras in dias:
+        if obras:
+            lineas.append(f"• {DIAS_VALIDOS[fecha.weekday()]} {fecha:%d/%m} → {', '.join(obras)}")
+    return "\n".join(lineas) if lineas else "📭 No hay subidas en esos días."
+
+@bot.command()
+async def semana(ctx):
+    hoy_peru = ahora_local().date()
+    dias = obras_en_rango(hoy_peru, hoy_peru + datetime.timedelta(days=6))
+    await responder(ctx, "⭑ PRÓXIMOS 7 DÍAS ⭑\n\n" + formatear_subidas(dias))
+
+MAX_DIAS_RANGO = 62
+
+@bot.command()
+async def rango(ctx, desde, hasta):
+    """
+    !rango 2026-10-01 2026-10-15
+    """
+    try:
+        d1 = datetime.datetime.strptime(desde, "%Y-%m-%d").date()
+        d2 = datetime.datetime.strptime(hasta, "%Y-%m-%d").date()
+    except ValueError:
+        await responder(ctx, "❌ Usa fechas YYYY-MM-DD. Ejemplo: !rango 2026-10-01 2026-10-15")
+        return
+    if d2 < d1:
+        d1, d2 = d2, d1
+    if (d2 - d1).days >= MAX_DIAS_RANGO:
+        await responder(ctx, f"❌ El rango puede ser de hasta {MAX_DIAS_RANGO} días.")
+        return
+    dias = obras_en_rango(d1, d2)
+    await responder(ctx, f"⭑ SUBIDAS {d1:%d/%m} – {d2:%d/%m} ⭑\n\n" + formatear_subidas(dias))
+
+# =========================
+# HOY / MAÑANA
+# =========================
+def obras_por_fecha(fecha: datetime.date):
+    """Obras del calendario que suben en esa fecha, en el orden del calendario."""
+    return indice_calendario()[(fecha.weekday(), fecha.day)]
+
+def obras_en_rango(desde: datetime.date, hasta: datetime.date):
+    """Lista de (fecha, obras) para cada día entre desde y hasta (incluidos)."""
+    indice = indice_calendario()
+    dias = (hasta - desde).days + 1
+    resultado = []
+    for i in range(max(dias, 0)):
+        fecha = desde + datetime.timedelta(days=i)
+        resultado.append((fecha, indice[(fecha.weekday(), fecha.day)]))
+    return resultado
+
+async def hojas_para_fecha(fecha: datetime.date):
+    """Solo las hojas que hacen falta para !hoy / !mañana: las que suben ese día y las de dentro de 7."""
+    necesarias = obras_por_fecha(fecha) + obras_por_fecha(fecha + datetime.timedelta(days=7))
+    return await obtener_hojas_async(necesarias)
+
+def obtener_caps_a_asignar_para_fecha(fecha_base: datetime.date, hojas):
+    """
+    Busca obras que se subirán 7 días después de 'fecha_base'
+    y devuelve lista de (obra, cap, faltas_asignar).
+    """
+    fecha_target = fecha_base + datetime.timedelta(days=7)
+    reporte = ReporteAsignar(obras_excluidas(), obras_por_fecha(fecha_target))
+    ejecutar_reportes(hojas, [reporte])
+    return reporte.resultado()
+
+@bot.command()
+async def hoy(ctx):
+    # Fecha base (hoy Perú)
+    ahora = ahora_local()
+    fecha = ahora.date()
+
+    hojas = await hojas_para_fecha(fecha)
+
+    # Obras que se suben hoy
+    obras = obras_por_fecha(fecha)
+
+    # Caps a asignar hoy (para dentro de 7 días)
+    asignar = obtener_caps_a_asignar_para_fecha(fecha, hojas)
+
+    msg_partes = []
+
+    msg = "⭑ HOY ⭑\n\n"
+    if not obras:
+        msg += "📭 Hoy no hay obras en el calendario.\n"
+    else:
+        msg += "⬆️ Subidas a la web:\n"
+        for obra in obras:
+            # Intentamos obtener el próximo cap no subido
+            hoja = obtener_hoja(hojas, obra)
+            if hoja is None:
+                msg += f"• {obra}\n"
+                continue
+            capitulo = encontrar_proximo_cap_no_temple(hoja)
+            if capitulo:
+                msg += f"• {obra} → Cap {capitulo.cap}\n"
+            else:
+                msg += f"• {obra}\n"
+    msg_partes.append(msg)
+
+    if asignar:
+        lineas = []
+        for obra, cap, faltan in asignar:
+            faltas_txt = ", ".join(faltan)
+            lineas.append(f"• {obra} → Cap {cap} | {faltas_txt}")
+        msg2 = "\n📝 Caps por asignar (para dentro de 7 días):\n" + "\n".join(lineas)
+        msg_partes.append(msg2)
+
+    await responder(ctx, "\n".join(msg_partes))
+
+@bot.command()
+async def mañana(ctx):
+    ahora = ahora_local()
+    fecha = (ahora + datetime.timedelta(days=1)).date()
+
+    hojas = await hojas_para_fecha(fecha)
+    obras = obras_por_fecha(fecha)
+    asignar = obtener_caps_a_asignar_para_fecha(fecha, hojas)
+
+    msg_partes = []
+
+    msg = "⭑ MAÑANA ⭑\n\n"
+    if not obras:
+        msg += "📭 Mañana no hay obras en el calendario.\n"
+    else:
+        msg += "⬆️ Subidas a la web:\n"
+        for obra in obras:
+            hoja = obtener_hoja(hojas, obra)
+            if hoja is None:
+                msg += f"• {obra}\n"
+                continue
+            capitulo = encontrar_proximo_cap_no_temple(hoja)
+            if capitulo:
+                msg += f"• {obra} → Cap {capitulo.cap}\n"
+            else:
+                msg += f"• {obra}\n"
+    msg_partes.append(msg)
+
+    if asignar:
+        lineas = []
+        for obra, cap, faltan in asignar:
+            faltas_txt = ", ".join(faltan)
+            lineas.append(f"• {obra} → Cap {cap} | {faltas_txt}")
+        msg2 = "\n📝 Caps por asignar (para dentro de 7 días):\n" + "\n".join(lineas)
+        msg_partes.append(msg2)
+
+    await responder(ctx, "\n".join(msg_partes))
+
+# =========================
+# PLAZOS Y ATRASOS
+# =========================
+# Los plazos, ya con la fecha interpretada, viven en un min-heap por vencimiento.
+# Borrar o reemplazar un plazo no toca el heap: la entrada vieja queda marcada
+# como vencida (no está en `vigentes`) y se salta al recorrer. Un único timer
+# espera al próximo vencimiento para avisar por DM justo cuando pasa.
+class MotorPlazos:
+    def __init__(self):
+        self.heap = []  # (fecha ISO, obra, cap, persona)
+        self.vigentes = {}  # (obra, cap) -> la entrada del heap que vale
+        self.version = None
+
+    def _al_dia(self):
+        """Rehace el heap si plazos.json cambió por otro lado (o la primera vez)."""
+        version = version_estado(ARCHIVO_PLAZOS)
+        if self.version == version:
+            return
+        self.heap, self.vigentes = [], {}
+        for obra, caps in cargar(ARCHIVO_PLAZOS, {}).items():
+            for cap, info in caps.items():
+                entrada = self._poner(obra, cap, info.get("persona", ""), info.get("fecha"))
+                if entrada:
+                    self.heap.append(entrada)
+        heapq.heapify(self.heap)
+        self.version = version
+
+    def _poner(self, obra, cap, persona, fecha):
+        fecha = _fecha_plazo(fecha)
+        if fecha is None:
+            self.vigentes.pop((obra, cap), None)
+            return None
+        entrada = (fecha, obra, cap, persona)
+        self.vigentes[(obra, cap)] = entrada
+        return entrada
+
+    def asignar(self, obra, cap, persona, fecha):
+        self._al_dia()
+        entrada = self._poner(obra, cap, persona, fecha)
+        if entrada:
+            heapq.heappush(self.heap, entrada)
+        self._compactar()
+
+    def eliminar(self, obra, cap):
+        self._al_dia()
+        self.vigentes.pop((obra, cap), None)
+        self._compactar()
+
+    def sincronizado(self):
+        """Después de guardar plazos.json: lo que hay en memoria ya refleja esa versión."""
+        self.version = version_estado(ARCHIVO_PLAZOS)
+
+    def _compactar(self):
+        if len(self.heap) > 2 * len(self.vigentes) + 32:
+            self.heap = list(self.vigentes.values())
+            heapq.heapify(self.heap)
+
+    def en_orden(self):
+        """Entradas vigentes de la más próxima a la más lejana. Cada una cuesta O(log n)."""
+        self._al_dia()
+        heap = self.heap
+        frontera = [(heap[0], 0)] if heap else []
+        while frontera:
+            entrada, i = heapq.heappop(frontera)
+            if self.vigentes.get((entrada[1], entrada[2])) is entrada:
+                yield entrada
+            for hijo in (2 * i + 1, 2 * i + 2):
+                if hijo < len(heap):
+                    heapq.heappush(frontera, (heap[hijo], hijo))
+
+    def entre(self, desde, hasta):
+        """Plazos con desde <= fecha < hasta (fechas ISO; desde=None = sin límite)."""
+        resultado = []
+        for entrada in self.en_orden():
+            if entrada[0] >= hasta:
+                break
+            if desde is None or entrada[0] >= desde:
+                resultado.append(entrada)
+        return resultado
+
+motor_plazos = MotorPlazos()
+_timer_plazos = {"handle": None}
+REINTENTO_PLAZOS = 300  # segundos hasta reintentar un aviso de plazos que no salió
+
+def consultar_atrasos(hoy):
+    """(fecha YYYY-MM-DD, obra, cap, persona) de los plazos vencidos antes de hoy, los más viejos primero."""
+    return motor_plazos.entre(None, hoy.isoformat())
+
+def _inicio_del_dia_siguiente(fecha_iso):
+    dia = datetime.date.fromisoformat(fecha_iso) + datetime.timedelta(days=1)
+    return datetime.datetime.combine(dia, datetime.time(0, 0), tzinfo=ZONA)
+
+def programar_aviso_plazos(minimo=0):
+    """Deja un solo timer para el próximo plazo que se vence (y cancela el anterior).
+
+    minimo: segundos que espera como poco (para reintentar sin martillar a Discord)."""
+    if _timer_plazos["handle"] is not None:
+        _timer_plazos["handle"].cancel()
+        _timer_plazos["handle"] = None
+    try:
+        loop = asyncio.get_running_loop()
+    except RuntimeError:
+        return  # sin loop todavía: on_ready lo programa
+    avisado = cargar(ARCHIVO_EJECUCIONES, {}).get("plazos_avisados")
+    siguiente = next((e for e in motor_plazos.en_orden() if avisado is None or e[0] > avisado), None)
+    if siguiente is None:
+        return
+    espera = (_inicio_del_dia_siguiente(siguiente[0]) - ahora_local()).total_seconds()
+    _timer_plazos["handle"] = loop.call_later(max(espera, minimo), lambda: asyncio.ensure_future(avisar_plazos_vencidos()))
+
+async def avisar_plazos_vencidos():
+    """Manda por DM los plazos que se vencieron desde el último aviso."""
+    _timer_plazos["handle"] = None
+    ejecuciones = cargar(ARCHIVO_EJECUCIONES, {})
+    hoy = ahora_local().date()
+    if "plazos_avisados" not in ejecuciones:
+        # Primera vez: los atrasos viejos ya se ven con !ver_atrasos, no se avisan
+        ejecuciones["plazos_avisados"] = (hoy - datetime.timedelta(days=1)).isoformat()
+    vencidos = [e for e in consultar_atrasos(hoy) if e[0] > ejecuciones["plazos_avisados"]]
+    if vencidos:
+        lineas = [f"• {obra} Cap {cap} → {persona} (vencía {fecha})" for fecha, obra, cap, persona in vencidos]
+        try:
+            await enviar_dm("⏰ PLAZOS VENCIDOS\n\n" + "\n".join(lineas))
+        except discord.HTTPException as e:
+            _canal_dueño.clear()
+            print(f"❌ No pude mandar el aviso de plazos por DM: {e}")
+            # plazos_avisados no avanza: el mismo aviso se reintenta más tarde
+            programar_aviso_plazos(REINTENTO_PLAZOS)
+            return
+        ejecuciones["plazos_avisados"] = vencidos[-1][0]
+    guardar(ARCHIVO_EJECUCIONES, ejecuciones)
+    programar_aviso_plazos()
+
+@bot.command()
+async def asignar_plazo(ctx, obra, cap, persona, fecha):
+    obra = resolver_obra(obra)
+    # Primero el heap: si se guardara antes, vería plazos.json "cambiado por otro lado" y lo rehará entero
+    motor_plazos.asignar(obra, cap, persona, fecha)
+    data = cargar(ARCHIVO_PLAZOS, {})
+    data.setdefault(obra, {})
+    data[obra][cap] = {"persona": persona, "fecha": fecha}
+    guardar(ARCHIVO_PLAZOS, data)
+    motor_plazos.sincronizado()
+    programar_aviso_plazos()
+    await responder(ctx, f"✅ Plazo asignado: {obra} Cap {cap} → {persona} hasta {fecha}")
+
+@bot.command()
+async def eliminar_plazo(ctx, obra, cap):
+    obra = resolver_obra(obra)
+    data = cargar(ARCHIVO_PLAZOS, {})
+    if obra in data and cap in data[obra]:
+        motor_plazos.eliminar(obra, cap)
+        del data[obra][cap]
+        guardar(ARCHIVO_PLAZOS, data)
+        motor_plazos.sincronizado()
+        programar_aviso_plazos()
+        await responder(ctx, "🗑️ Plazo eliminado.")
+    else:
+        await responder(ctx, "❌ No encontré ese plazo.")
+
+@bot.command()
+async def ver_atrasos(ctx):
+    data = cargar(ARCHIVO_PLAZOS, {})
+    if not data:
+        await responder(ctx, "✅ No hay plazos registrados.")
+        return
+
+    hoy_peru = ahora_local().date()
+    atrasos = []
+
+    for fecha, obra, cap, persona in consultar_atrasos(hoy_peru):
+        f = datetime.date.fromisoformat(fecha)
+        dias = (hoy_peru - f).days
+        atrasos.append(f"{obra} Cap {cap} → {persona} ({dias} días tarde)")
+
+    if not atrasos:
+        await responder(ctx, "✅ No hay atrasos.")
+    else:
+        msg = "⏰ ATRASOS:\n" + "\n".join(f"- {a}" for a in atrasos)
+        await responder(ctx, msg)
+
+MAX_DIAS_PLAZOS = 60
+
+@bot.command()
+async def proximos_plazos(ctx, dias: int = 7):
+    """
+    !proximos_plazos      → plazos que vencen en los próximos 7 días
+    !proximos_plazos 14
+    """
+    dias = max(1, min(dias, MAX_DIAS_PLAZOS))
+    hoy = ahora_local().date()
+    proximos = motor_plazos.entre(hoy.isoformat(), (hoy + datetime.timedelta(days=dias + 1)).isoformat())
+    if not proximos:
+        await responder(ctx, f"✅ No vence ningún plazo en los próximos {dias} días.")
+        return
+    lineas = []
+    for fecha, obra, cap, persona in proximos:
+        faltan = (datetime.date.fromisoformat(fecha) - hoy).days
+        cuando = "hoy" if faltan == 0 else f"en {faltan} día(s)"
+        lineas.append(f"- {obra} Cap {cap} → {persona} ({fecha}, {cuando})")
+    await responder(ctx, f"📅 PLAZOS PRÓXIMOS ({dias} días):\n" + "\n".join(lineas))
+
+# =========================
+# ESTADÍSTICAS
+# =========================
+def formatear_duracion(segundos):
+    if segundos >= SEGUNDOS_DIA:
+        return f"{segundos / SEGUNDOS_DIA:.1f} días"
+    return f"{segundos / 3600:.1f} h"
+
+def _lineas_estadisticas(obra):
+    lineas = []
+    for etapa in ETAPAS:
+        semana = historial.completados(obra, etapa, 7)
+        mes = historial.completados(obra, etapa, 30)
+        linea = f"• {etapa}: {semana} en 7 días, {mes} en 30 días"
+        mediana = historial.mediana(obra, etapa)
+        if mediana is not None:
+            linea += f" | mediana desde la etapa anterior: {formatear_duracion(mediana)}"
+        lineas.append(linea)
+    ciclo = historial.mediana(obra, "ciclo")
+    if ciclo is not None:
+        lineas.append(f"• RAW → Temple (mediana): {formatear_duracion(ciclo)}")
+    return lineas
+
+@bot.command()
+async def estadisticas(ctx, *, obra=None):
+    """
+    !estadisticas            → todas las obras
+    !estadisticas obra       → solo esa obra
+    """
+    await asyncio.to_thread(historial.cargar)  # la primera vez puede leer el log
+    if obra is None:
+        msg = "⭑ ESTADÍSTICAS (todas las obras) ⭑\n\n" + "\n".join(_lineas_estadisticas(None))
+        ranking = sorted(
+            ((historial.completados(o, "temple", 30), o) for o in historial.obras()),
+            reverse=True,
+        )
+        ranking = [(n, o) for n, o in ranking if n][:5]
+        if ranking:
+            msg += "\n\nMás caps subidos a Temple (30 días):\n"
+            msg += "\n".join(f"• {o} → {n}" for n, o in ranking)
+        await responder(ctx, msg)
+        return
+
+    obra = resolver_obra(obra, difuso=True)
+    if obra not in historial.obras():
+        await responder(ctx, f"📂 Todavía no hay historial de {obra}.")
+        return
+    await responder(ctx, f"⭑ ESTADÍSTICAS {obra} ⭑\n\n" + "\n".join(_lineas_estadisticas(obra)))
+
+# =========================
+# CARGA DE TRABAJO
+# =========================
+ETIQUETA_ETAPA = {etapa: etiqueta for etapa, etiqueta in ROL_ETAPA.values()}
+
+def plazo_de(plazos, obra, cap, persona):
+    """Fecha límite (YYYY-MM-DD) de ese cap si el plazo es de esa persona, o None."""
+    info = plazos.get(obra, {}).get(cap)
+    if info and normalizar_nombre(info.get("persona", "")) == normalizar_nombre(persona):
+        return _fecha_plazo(info.get("fecha", ""))
+    return None
+
+async def cargas_al_dia():
+    indice_cargas.actualizar(await obtener_snapshot_async())
+    return cargar(ARCHIVO_PLAZOS, {}), ahora_local().date().isoformat()
+
+@bot.command()
+async def carga(ctx, *, persona):
+    """
+    !carga ana → todo lo que ana tiene abierto, en todas las obras
+    """
+    plazos, hoy = await cargas_al_dia()
+    nombre, items = indice_cargas.de(persona)
+    if not items:
+        await responder(ctx, f"✅ {nombre} no tiene nada pendiente asignado.")
+        return
+
+    lineas = []
+    for obra, cap, etapa in items:
+        linea = f"• {obra} → Cap {cap} | {ETIQUETA_ETAPA[etapa]}"
+        fecha = plazo_de(plazos, obra, cap, nombre)
+        if fecha:
+            linea += f" (plazo {fecha}{' ⏰ atrasado' if fecha < hoy else ''})"
+        lineas.append(linea)
+    await responder(ctx, f"⭑ CARGA DE {nombre} ⭑\n\n" + "\n".join(lineas) + f"\n\nTotal: {len(items)}")
+
+@bot.command()
+async def cargas(ctx):
+    plazos, hoy = await cargas_al_dia()
+    resumen = indice_cargas.resumen()
+    if not resumen:
+        await responder(ctx, "✅ Nadie tiene etapas pendientes asignadas.")
+        return
+
+    lineas = []
+    for nombre, items in sorted(resumen, key=lambda r: (-len(r[1]), r[0].lower())):
+        fechas = [f for f in (plazo_de(plazos, o, c, nombre) for o, c, _ in items) if f]
+        atrasados = sum(1 for f in fechas if f < hoy)
+        linea = f"• {nombre} → {len(items)}"
+        if fechas:
+            linea += f" ({len(fechas)} con plazo{f', {atrasados} atrasado(s)' if atrasados else ''})"
+        lineas.append(linea)
+    await responder(ctx, "⭑ CARGA POR PERSONA ⭑\n\n" + "\n".join(lineas))
+
+# =========================
+# COMANDOS (LISTA)
+# =========================
+@bot.command()
+async def comandos(ctx):
+    await responder(ctx, """
+📌 COMANDOS DEL BOT
+
+!ping → Ver si el bot está activo.
+
+!refrescar → Forzar que se vuelva a leer el Excel (si acabas de editarlo).
+
+!raw_pendientes → Ver el siguiente Cap que falta RAW de cada obra.
+
+!ver_estado obra Cap → Ver qué falta en ese Cap (RAW, tradu, clean, type, Temple).
+
+!marcar obra caps etapas → Poner ✅ en el Excel. Ej: !marcar obra 12-15 clean type (etapas: raw, trad, clean, type, temple).
+
+!desmarcar obra caps etapas → Quitar el ✅ de esas etapas.
+
+!hiatus obra → Poner una obra en pausa (no entra en recordatorios de RAW / asignación).
+
+!reactivar obra → Quitar la obra del hiatus.
+
+!ver_hiatus → Ver todas las obras pausadas.
+
+!solo obra → Marcar una obra como solo tuya (sin recordatorios de RAW / asignación).
+
+!reactivar_solo obra → Quitar el modo solo.
+
+!ver_solo → Ver obras en modo solo.
+
+!agregar_obra obra día → Asignar día(s) de subida (semana o días del mes).
+
+!cambiar_dia obra día → Cambiar el día de subida de una obra.
+
+!eliminar_obra obra → Eliminar una obra del calendario.
+
+!calendario → Ver el calendario completo.
+
+!semana → Ver qué obras se suben en los próximos 7 días.
+
+!rango desde hasta → Ver las subidas entre dos fechas (YYYY-MM-DD), hasta 62 días.
+
+!hoy → Ver lo que toca hoy (subidas) y qué Caps hay que asignar (para dentro de 7 días).
+
+!mañana → Ver lo que toca mañana (subidas) y qué Caps hay que asignar (para dentro de 7 días).
+
+!asignar_plazo obra Cap persona fecha → Asignar una fecha límite (YYYY-MM-DD) a alguien.
+
+!eliminar_plazo obra Cap → Borrar un plazo.
+
+!ver_atrasos → Ver quién está atrasado según los plazos.
+
+!proximos_plazos [días] → Ver los plazos que vencen en los próximos días (7 si no dices cuántos).
+
+!carga persona → Ver todo lo que esa persona tiene pendiente en todas las obras (con sus plazos).
+
+!cargas → Ver cuántas etapas pendientes tiene asignadas cada persona.
+
+!estadisticas [obra] → Caps que pasaron por cada etapa (7 y 30 días) y tiempos típicos entre etapas.
+
+!alias corto nombre_obra → Crear una abreviación para una obra.
+
+!ver_alias → Ver todos los alias registrados.
+
+!comandos → Ver esta lista completa.
+""")
+
+# =========================
+# RECORDATORIOS AUTOMÁTICOS
+# =========================
+def armar_recordatorios(hojas, ahora_peru):
+    """
+    Todos los reportes del recordatorio, sacados de una sola pasada por el snapshot.
+    ahora_peru es el turno que se está cumpliendo, en hora local.
+    """
+    hoy = ahora_peru.date()
+    excluidas = obras_excluidas()
+
+    # 1) RAW inmediato (siguiente Cap de cada obra)
+    raw = ReporteRaw(excluidas)
+    reportes = [
+        raw,
+        # 2) RAW 10 días antes según calendario
+        ReporteRaw(
+            excluidas,
+            obras=obras_por_fecha(hoy + datetime.timedelta(days=10)),
+            titulo="⭑ RAW PRÓXIMO (dentro de 10 días) ⭑",
+            vacio=None,
+        ),
+        # 3) Caps por asignar (para dentro de 7 días desde hoy)
+        ReporteAsignar(excluidas, obras_por_fecha(hoy + datetime.timedelta(days=7))),
+        # 4) Al menos un Cap listo para subir a Temple
+        ReporteTemple(),
+    ]
+    # 5) Resumen semanal simple (domingo 18:00)
+    if ahora_peru.weekday() == 6 and f"{ahora_peru:%H:%M}" == HORARIO_RESUMEN:
+        reportes.append(ReporteResumen(raw))
+
+    return ejecutar_reportes(hojas, reportes)
+
+# La tarea duerme hasta el próximo horario en vez de despertar cada minuto.
+# El próximo horario se calcula con fechas con zona: tasks.loop(time=...) ordena
+# los horarios sin mirar su zona y con zonas distintas se saltaba turnos.
+# El último turno cumplido queda guardado: si el bot estaba caído o reconectando
+# justo a esa hora, al volver (on_ready) se manda el recordatorio atrasado.
+_lock_recordatorio = asyncio.Lock()
+
+@tasks.loop()
+async def chequeo_automatico():
+    turno = proximo_turno(ahora_local())
+    while ahora_local() < turno:
+        await discord.utils.sleep_until(turno)
+    await ejecutar_recordatorio(turno)
+
+async def ejecutar_recordatorio(turno):
+    async with _lock_recordatorio:
+        with metricas.medir("bot_recordatorio_segundos"):
+            await _ejecutar_recordatorio(turno)
+
+async def _ejecutar_recordatorio(turno):
+    ejecuciones = cargar(ARCHIVO_EJECUCIONES, {})
+    ultima = ejecuciones.get("recordatorio")
+    if ultima and datetime.datetime.fromisoformat(ultima) >= turno:
+        return  # este turno ya se mandó
+
+    try:
+        hojas = await obtener_snapshot_async()
+    except (asyncio.TimeoutError, gspread.exceptions.GSpreadException) as e:
+        # Si el loop de la tarea revienta deja de correr: mejor saltar este turno
+        print(f"⚠️ No pude leer el Excel para los recordatorios: {e!r}")
+        return
+
+    mensajes = armar_recordatorios(hojas, turno.astimezone(ZONA))
+
+    # Todos los reportes juntos, en la menor cantidad de DMs posible
+    try:
+        await enviar_dm(*mensajes)
+    except discord.HTTPException as e:
+        _canal_dueño.clear()
+        print(f"❌ No pude mandar el recordatorio por DM: {e}")
+        return
+
+    ejecuciones["recordatorio"] = turno.isoformat()
+    guardar(ARCHIVO_EJECUCIONES, ejecuciones)
+
+async def recuperar_recordatorio():
+    """Manda el último turno si se perdió hace menos de RECUPERAR_HORAS."""
+    ejecuciones = cargar(ARCHIVO_EJECUCIONES, {})
+    turno = ultimo_turno(ahora_local())
+    if "recordatorio" not in ejecuciones:
+        # Primera vez: no hay nada que recuperar, solo dejamos la marca
+        ejecuciones["recordatorio"] = turno.isoformat()
+        guardar(ARCHIVO_EJECUCIONES, ejecuciones)
+        return
+    if ahora_local() - turno > datetime.timedelta(hours=RECUPERAR_HORAS):
+        return
+    await ejecutar_recordatorio(turno)
+
+# =========================
+# WEBHOOK: CAMBIOS EN EL EXCEL
+# =========================
+# Un activador "Al editar" de Apps Script avisa qué celdas cambiaron. Si manda
+# los valores nuevos, se parchean los capítulos ya cargados; si no (o si tocó
+# encabezados o la columna de caps), esa hoja se vuelve a leer en el próximo uso.
+# Flask corre en otro hilo: el cambio se aplica dentro del loop del bot.
+_webhook = {"loop": None}
+
+def parchear_hoja(hoja, rango, valores):
+    """
+    Aplica valores nuevos (lista de filas) sobre el rango A1 de la hoja.
+    Devuelve los capítulos tocados, o None si hay que volver a leer la hoja.
+    """
+    grilla = a1_range_to_grid_range(rango.rpartition("!")[2])
+    fila0 = grilla.get("startRowIndex")
+    col0 = grilla.get("startColumnIndex")
+    if fila0 is None or col0 is None or fila0 < 2 or col0 == 0:
+        return None  # encabezados, columna de caps o rango abierto
+    por_fila = {c.fila: c for c in hoja.capitulos}
+    columnas = {}
+    for clave in COLUMNAS:
+        columnas.setdefault(getattr(hoja.esquema, clave), []).append(clave)
+
+    filas = []
+    for i in range(len(valores)):
+        capitulo = por_fila.get(fila0 + i + 1)
+        if capitulo is None:
+            return None  # fila nueva o sin número de cap
+        filas.append(capitulo)
+
+    tocados = []
+    cambios = []
+    for capitulo, fila in zip(filas, valores):
+        previo = Capitulo.desde_tupla(capitulo.a_tupla())
+        for j, valor in enumerate(fila):
+            for clave in columnas.get(col0 + j, ()):
+                if clave in ETAPAS:
+                    setattr(capitulo, clave, valor == "✅")
+                else:
+                    setattr(capitulo, clave, str(valor).strip())
+        tocados.append(capitulo)
+        if previo.a_tupla() != capitulo.a_tupla():
+            cambios.append((previo, capitulo))
+    hoja.derivados.clear()
+    _snapshot["huellas"].pop(hoja.titulo, None)  # ya no es lo que se descargó
+    notificar_cambios(hoja.titulo, cambios)
+    return tocados
+
+def aplicar_cambio(titulo, rango, valores):
+    """Parchea o invalida la hoja editada. Devuelve los avisos inmediatos que correspondan."""
+    metricas.incrementar("bot_webhook_total")
+    if titulo in IGNORAR_HOJAS:
+        return []
+    hoja = _snapshot["hojas"].get(titulo)
+    if hoja is None:
+        invalidar_snapshot()  # hoja nueva o renombrada: también hay que releer la lista
+        return []
+    if hoja.esquema is None or not rango or valores is None:
+        invalidar_hoja(titulo)
+        return []
+
+    antes = {c.fila: (c.raw, cap_listo_para_temple(hoja.esquema, c)) for c in hoja.capitulos}
+    try:
+        tocados = parchear_hoja(hoja, rango, valores)
+    except (gspread.exceptions.IncorrectCellLabel, TypeError, ValueError):
+        tocados = None
+    if tocados is None:
+        invalidar_hoja(titulo)
+        return []
+    metricas.incrementar("bot_webhook_parches_total")
+
+    avisos = []
+    excluida = titulo in obras_excluidas()
+    for c in tocados:
+        raw_antes, listo_antes = antes[c.fila]
+        if c.raw and not raw_antes and not excluida:
+            avisos.append(f"📥 RAW subido: {titulo} → Cap {c.cap}")
+        if cap_listo_para_temple(hoja.esquema, c) and not listo_antes:
+            avisos.append(f"⭑ LISTO PARA SUBIR A LA WEB ⭑\n\n• {titulo} → Cap {c.cap}")
+    return avisos
+
+async def _avisar_cambio(titulo, rango, valores):
+    avisos = aplicar_cambio(titulo, rango, valores)
+    if not (avisos and WEBHOOK_AVISOS):
+        return
+    try:
+        await enviar_dm(*avisos)
+    except discord.HTTPException as e:
+        _canal_dueño.clear()
+        print(f"❌ No pude mandar el aviso por DM: {e}")
+
+def _registrar_error_webhook(futuro):
+    # Nadie espera este futuro: sin esto un error se perdería en silencio
+    if futuro.cancelled() or futuro.exception() is None:
+        return
+    e = futuro.exception()
+    print("❌ Error aplicando un cambio del webhook:")
+    traceback.print_exception(type(e), e, e.__traceback__)
+
+@app.route("/webhook/hoja", methods=["POST"])
+def webhook_hoja():
+    if not WEBHOOK_TOKEN:
+        return jsonify(error="webhook desactivado"), 404
+    token = request.headers.get("X-Webhook-Token", "")
+    if not hmac.compare_digest(token.encode("utf-8"), WEBHOOK_TOKEN.encode("utf-8")):
+        return jsonify(error="token inválido"), 401
+    datos = request.get_json(silent=True)
+    if not isinstance(datos, dict) or not isinstance(datos.get("hoja"), str):
+        return jsonify(error='falta "hoja"'), 400
+    rango = datos.get("rango")
+    if rango is not None and not isinstance(rango, str):
+        return jsonify(error='"rango" tiene que ser texto A1'), 400
+    valores = datos.get("valores")
+    if valores is not None and not (isinstance(valores, list) and all(isinstance(f, list) for f in valores)):
+        return jsonify(error='"valores" tiene que ser una lista de filas'), 400
+
+    loop = _webhook["loop"]
+    if loop is None or loop.is_closed():
+        return jsonify(error="el bot todavía no está conectado"), 503
+    futuro = asyncio.run_coroutine_threadsafe(_avisar_cambio(datos["hoja"], rango, valores), loop)
+    futuro.add_done_callback(_registrar_error_webhook)
+    return jsonify(ok=True), 202
+
+# =========================
+# SALUD (WATCHDOG)
+# =========================
+# Una tarea late cada SALUD_INTERVALO y anota cuánto se atrasó el loop. Si el loop
+# queda trabado (una llamada bloqueante, por ejemplo), el latido deja de llegar y
+# /health lo nota igual: el atraso se calcula desde el hilo de Flask.
+_salud = {"inicio": time.monotonic(), "latido": None, "lag": 0.0, "tarea": None, "espera_hasta": None}
+
+async def vigilar_loop():
+    while True:
+        antes = time.monotonic()
+        await asyncio.sleep(SALUD_INTERVALO)
+        ahora = time.monotonic()
+        _salud["lag"] = max(ahora - antes - SALUD_INTERVALO, 0.0)
+        _salud["latido"] = ahora
+        metricas.observar("bot_loop_lag_segundos", _salud["lag"])
+
+def iniciar_watchdog():
+    # Cada vuelta del bucle de reintentos de main() trae un loop nuevo
+    if _salud["tarea"] is None or _salud["tarea"].done():
+        _salud["tarea"] = asyncio.get_running_loop().create_task(vigilar_loop())
+
+def esperar_reconexion(segundos):
+    """
+    Espera de main() antes de volver a conectar. Mientras dura (y la gracia para
+    reconectar) /health no se queja de Discord ni del loop: si el host reiniciara
+    el proceso por eso, se saltaría justo el backoff que evita el loop de reinicios.
+    """
+    _salud["espera_hasta"] = time.monotonic() + segundos
+    time.sleep(segundos)
+
+def estado_salud():
+    """Devuelve (sano, detalle). Se llama desde el hilo de Flask: solo lee."""
+    ahora = time.monotonic()
+    arrancando = ahora - _salud["inicio"] < SALUD_GRACIA
+    espera_hasta = _salud["espera_hasta"]
+    esperando = espera_hasta is not None and ahora < espera_hasta + SALUD_GRACIA
+    problemas = []
+
+    lag = _salud["lag"]
+    if _salud["latido"] is not None:
+        lag = max(lag, ahora - _salud["latido"] - SALUD_INTERVALO)
+    elif not arrancando and not esperando:
+        problemas.append("watchdog sin latidos")
+    if lag > SALUD_MAX_LAG and not esperando:
+        problemas.append(f"loop atrasado {lag:.1f}s")
+
+    conectado = bot.is_ready() and not bot.is_closed()
+    latencia = bot.latency if math.isfinite(bot.latency) else None
+    if not conectado and not arrancando and not esperando:
+        problemas.append("desconectado de Discord")
+    if latencia is not None and latencia > SALUD_MAX_LATENCIA:
+        problemas.append(f"latencia del gateway {latencia:.1f}s")
+
+    # El recordatorio está en falta si su último turno pasó hace rato, no quedó
+    # marcado como enviado y el bot ya estaba corriendo a esa hora.
+    turno = ultimo_turno(ahora_local())
+    ultima = _estado.get(ARCHIVO_EJECUCIONES, {}).get("recordatorio")
+    atraso = (ahora_local() - turno).total_seconds()
+    corria = time.time() - (ahora - _salud["inicio"]) < turno.timestamp()
+    if (
+        atraso > SALUD_MARGEN_RECORDATORIO
+        and corria
+        and not esperando
+        and not (ultima and datetime.datetime.fromisoformat(ultima) >= turno)
+    ):
+        problemas.append(f"recordatorio de las {turno:%H:%M} sin enviar")
+    if conectado and not chequeo_automatico.is_running():
+        problemas.append("tarea de recordatorios detenida")
+
+    edad_snapshot = time.time() - _snapshot["cargado"] if _snapshot["cargado"] else None
+    if SALUD_MAX_SNAPSHOT and edad_snapshot is not None and edad_snapshot > SALUD_MAX_SNAPSHOT:
+        problemas.append(f"Excel en caché de hace {edad_snapshot:.0f}s")
+
+    detalle = {
+        "problemas": problemas,
+        "lag_loop": round(lag, 3),
+        "discord_conectado": conectado,
+        "latencia_gateway": latencia,
+        "ultimo_recordatorio": ultima,
+        "turno_esperado": turno.isoformat(),
+        "edad_snapshot": edad_snapshot,
+        "reconexion_en": round(espera_hasta - ahora, 1) if esperando and ahora < espera_hasta else None,
+    }
+    return not problemas, detalle
+
+@app.route("/health")
+def health():
+    sano, detalle = estado_salud()
+    detalle["estado"] = "ok" if sano else "mal"
+    return jsonify(detalle), 200 if sano else 503
+
+# =========================
+# INICIO
+# =========================
+def main():
+    mantener_vivo()
+    if cargar_snapshot_disco():
+        print(f"📦 Excel cargado desde {ARCHIVO_SNAPSHOT} (se revisa con Google al conectar)")
+
+    backoff = 60  # empieza esperando 60s si Discord bloquea (evita loop de reinicios)
+
+    while True:
+        try:
+            bot.run(DISCORD_TOKEN)
+            volcar_estado()
+            break  # si por alguna razón bot.run termina "limpio", salimos
+        except discord.HTTPException as e:
+            # Si Discord/Cloudflare bloquea (429), NO cierres el proceso: espera y reintenta
+            if getattr(e, "status", None) == 429:
+                print(f"⚠️ Rate limit / bloqueo (429). Reintentando más tarde. backoff={backoff}s")
+                esperar_reconexion(backoff)
+                backoff = min(backoff * 2, 3600)  # máximo 1 hora
+                continue
+            raise  # otros errores: que sí falle para que lo veas
+        except Exception as e:
+            # Cualquier otro error inesperado: log y reintenta con un backoff suave
+            print(f"❌ Error inesperado: {e}. Reintentando en {backoff}s")
+            esperar_reconexion(backoff)
+            backoff = min(backoff * 2, 3600)
+
+if __name__ == "__main__":
+    main()